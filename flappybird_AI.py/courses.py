@@ -0,0 +1,142 @@
+import hashlib
+import multiprocessing as mp
+import struct
+from collections import OrderedDict
+import numpy as np
+from neat_batch import BatchNetwork
+from population import Population, batch_activate
+
+PIPE_MIN, PIPE_MAX = 50, 450 # range of Pipe.set_height
+CHUNK = 256 # pipes generated at a time
+
+
+class Course:
+    """
+    The pipe heights of one seeded game as a uint16 array. Heights are drawn
+    CHUNK at a time from the seed, so course[i] is the same however far the
+    course has been extended.
+    """
+
+    def __init__(self, seed, length=CHUNK):
+        self.seed = seed
+        self._rng = np.random.default_rng(seed)
+        self.heights = np.empty(0, dtype=np.uint16)
+        while len(self.heights) < length:
+            self._extend()
+
+    def _extend(self):
+        self.heights = np.concatenate([self.heights, self._rng.integers(PIPE_MIN, PIPE_MAX, CHUNK, dtype=np.uint16)])
+
+    def __getitem__(self, i):
+        while i >= len(self.heights):
+            self._extend()
+        return int(self.heights[i])
+
+
+def genome_hash(genome):
+    """
+    Hash of everything that shapes a genome's network: the nodes with their
+    bias, response, activation and aggregation and the enabled connections
+    with their weights. Genomes that only differ in key or disabled genes
+    share a hash.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for key in sorted(genome.nodes):
+        ng = genome.nodes[key]
+        h.update(struct.pack('<qdd', key, ng.bias, ng.response))
+        h.update(ng.activation.encode() + b'\0' + ng.aggregation.encode() + b'\0')
+    h.update(b'connections')
+    for key in sorted(k for k, cg in genome.connections.items() if cg.enabled):
+        h.update(struct.pack('<qqd', key[0], key[1], genome.connections[key].weight))
+    return h.hexdigest()
+
+
+class FitnessCache:
+    """
+    Fitness per (genome hash, course seed, max score), least recently used
+    entries are dropped beyond max_size
+    """
+
+    def __init__(self, max_size=100_000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        fitness = self.entries.get(key)
+        if fitness is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return fitness
+
+    def put(self, key, fitness):
+        self.entries[key] = fitness
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+
+def simulate(task):
+    # fitness of the genomes on one course, runs in the worker processes
+    seed, genomes, config, max_score = task
+    activate = batch_activate(BatchNetwork.create(genomes, config), genomes, config)
+    fitness, _ = Population(len(genomes)).run(activate, max_score=max_score, course=Course(seed))
+    return fitness
+
+
+class CourseEvaluator:
+    """
+    NEAT fitness function that scores every genome on the same seeded
+    courses and averages over them. Only genomes the cache has not seen on a
+    course are simulated; with more than one course and workers > 0 the
+    courses run in parallel worker processes.
+    """
+
+    def __init__(self, seeds=(0,), max_score=None, workers=0, cache=None):
+        self.seeds = list(seeds)
+        self.max_score = max_score
+        self.cache = cache if cache is not None else FitnessCache()
+        self.simulated = 0
+        self._pool = None
+        if workers and len(self.seeds) > 1:
+            self._pool = mp.get_context('spawn').Pool(min(workers, len(self.seeds)))
+
+    def __call__(self, genomes, config):
+        genomes = [g for _, g in genomes]
+        hashes = [genome_hash(g) for g in genomes]
+        fitness = np.zeros((len(genomes), len(self.seeds)))
+
+        tasks, pending = [], []
+        for j, seed in enumerate(self.seeds):
+            missing = {} # hash -> first genome with it, duplicates are simulated once
+            for i, h in enumerate(hashes):
+                cached = self.cache.get((h, seed, self.max_score))
+                if cached is None:
+                    missing.setdefault(h, i)
+                else:
+                    fitness[i, j] = cached
+            if missing:
+                tasks.append((seed, [genomes[i] for i in missing.values()], config, self.max_score))
+                pending.append((j, seed, list(missing)))
+                self.simulated += len(missing)
+
+        results = self._pool.map(simulate, tasks) if self._pool is not None else map(simulate, tasks)
+        for (j, seed, missing), scores in zip(pending, results):
+            for h, f in zip(missing, scores):
+                self.cache.put((h, seed, self.max_score), float(f))
+            scores = dict(zip(missing, scores))
+            for i, h in enumerate(hashes):
+                if h in scores:
+                    fitness[i, j] = scores[h]
+
+        for g, f in zip(genomes, fitness.mean(axis=1)):
+            g.fitness = float(f)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
@@ -2,27 +2,140 @@ import pygame
 import random
 import os
 import neat
-pygame.font.init()
+import geometry
 WIN_WIDTH = 600
 WIN_HEIGHT = 800
+IMG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imgs")
 
-# Initialize Pygame and the display
-pygame.init()
-win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
-pygame.display.set_caption("Flappy Bird")
-
-# Load images after display is initialized
-pipe_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "pipe.png")).convert_alpha())
-bg_img = pygame.transform.scale(pygame.image.load(os.path.join("imgs", "bg.png")).convert_alpha(), (600, 900))
-bird_images = [pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "bird" + str(x) + ".png"))) for x in range(1, 4)]
-base_img = pygame.transform.scale2x(pygame.image.load(os.path.join("imgs", "base.png")).convert_alpha())
-stat_font = pygame.font.SysFont("comicsans",50)
+win = None  # opened by get_window
 gen = 0
 
+
+class Assets:
+    """
+    Images, masks and fonts, each loaded and scaled on first use and then
+    cached. Importing the module loads nothing and opens no window, so the
+    game classes can be used headless (e.g. in worker processes).
+    """
+
+    def __init__(self, directory=IMG_DIR):
+        """
+        :param directory: folder with the sprite pngs
+        """
+        self.directory = directory
+        self.clear()
+
+    def clear(self):
+        """
+        forget every loaded surface, e.g. to reload them in the display format
+        once the window is open
+        :return: None
+        """
+        self.cache = {}
+        self.masks = {}
+
+    def cached(self, name, build):
+        surface = self.cache.get(name)
+        if surface is None:
+            surface = self.cache[name] = build()
+        return surface
+
+    def load(self, filename):
+        image = pygame.image.load(os.path.join(self.directory, filename))
+        # converting needs a display mode, headless the surfaces stay as loaded
+        if pygame.display.get_surface() is not None:
+            image = image.convert_alpha()
+        return image
+
+    @property
+    def pipe(self):
+        return self.cached("pipe", lambda: pygame.transform.scale2x(self.load("pipe.png")))
+
+    @property
+    def pipe_top(self):
+        return self.cached("pipe_top", lambda: pygame.transform.flip(self.pipe, False, True))
+
+    @property
+    def bg(self):
+        return self.cached("bg", lambda: pygame.transform.scale(self.load("bg.png"), (600, 900)))
+
+    @property
+    def base(self):
+        return self.cached("base", lambda: pygame.transform.scale2x(self.load("base.png")))
+
+    @property
+    def birds(self):
+        return self.cached("birds", lambda: [pygame.transform.scale2x(self.load("bird" + str(x) + ".png"))
+                                             for x in range(1, 4)])
+
+    @property
+    def bird_atlas(self):
+        """
+        every bird frame pre-rotated to each tilt Bird.move produces:
+        {tilt: [rotated frame 0, 1, 2]}
+        """
+        def build():
+            tilts = {0} | set(range(Bird.MAX_ROTATION, -90 - Bird.ROT_VEL, -Bird.ROT_VEL))
+            return {tilt: [pygame.transform.rotate(img, tilt) for img in self.birds] for tilt in tilts}
+        return self.cached("bird_atlas", build)
+
+    @property
+    def font(self):
+        def build():
+            pygame.font.init()
+            return pygame.font.SysFont("comicsans", 50)
+        return self.cached("font", build)
+
+    def bird_frame(self, index, tilt):
+        """
+        :param index: animation frame 0-2
+        :param tilt: degrees, tilts outside the atlas are rotated once and added
+        :return: rotated bird surface
+        """
+        frames = self.bird_atlas.get(tilt)
+        if frames is None:
+            frames = self.bird_atlas[tilt] = [pygame.transform.rotate(img, tilt) for img in self.birds]
+        return frames[index]
+
+    def mask(self, surface):
+        mask = self.masks.get(surface)
+        if mask is None:
+            mask = self.masks[surface] = pygame.mask.from_surface(surface)
+        return mask
+
+
+assets = Assets()
+
+
+class AssetAttribute:
+    """ Class attribute that reads an Assets property when it is accessed """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        return getattr(assets, self.name)
+
+
+def get_window():
+    """
+    the game window, opened on first call
+    :return: pygame display surface
+    """
+    global win
+    if win is None:
+        pygame.init()
+        win = pygame.display.set_mode((WIN_WIDTH, WIN_HEIGHT))
+        pygame.display.set_caption("Flappy Bird")
+        # anything loaded before now is reloaded converted to the display format
+        assets.clear()
+    return win
+
+
 class Bird:
     """ Bird class """
     MAX_ROTATION = 25
-    IMGS = bird_images
+    IMGS = AssetAttribute("birds")
     ROT_VEL = 20
     ANIMATION_TIME = 5  # Animation time
 
@@ -66,28 +179,29 @@ class Bird:
 
         # For animation of bird, loop through three images
         if self.img_count <= self.ANIMATION_TIME:
-            self.img = self.IMGS[0]
+            frame = 0
         elif self.img_count <= self.ANIMATION_TIME * 2:
-            self.img = self.IMGS[1]
+            frame = 1
         elif self.img_count <= self.ANIMATION_TIME * 3:
-            self.img = self.IMGS[2]
+            frame = 2
         elif self.img_count <= self.ANIMATION_TIME * 4:
-            self.img = self.IMGS[1]
-        elif self.img_count == self.ANIMATION_TIME * 4 + 1:
-            self.img = self.IMGS[0]
+            frame = 1
+        else:
+            frame = 0
             self.img_count = 0
 
         # So when bird is nose diving, it isn't flapping
         if self.tilt <= -80:
-            self.img = self.IMGS[1]
+            frame = 1
             self.img_count = self.ANIMATION_TIME * 2
 
-        rotated_image = pygame.transform.rotate(self.img, self.tilt)
+        self.img = self.IMGS[frame]
+        rotated_image = assets.bird_frame(frame, self.tilt)
         new_rect = rotated_image.get_rect(center=self.img.get_rect(topleft=(self.x, self.y)).center)
         win.blit(rotated_image, new_rect.topleft)
 
     def get_mask(self):
-        return pygame.mask.from_surface(self.img)
+        return assets.mask(self.img)
     
 class Pipe():
     """
@@ -95,6 +209,9 @@ class Pipe():
     """
     GAP = 200
     VEL = 5
+    PIPE_TOP = AssetAttribute("pipe_top")
+    PIPE_BOTTOM = AssetAttribute("pipe")
+    USE_MASKS = True  # False: pure geometry collisions, see geometry.py
 
     def __init__(self, x):
         """
@@ -110,9 +227,6 @@ class Pipe():
         self.top = 0
         self.bottom = 0
 
-        self.PIPE_TOP = pygame.transform.flip(pipe_img, False, True)
-        self.PIPE_BOTTOM = pipe_img
-
         self.passed = False
 
         self.set_height()
@@ -123,7 +237,7 @@ class Pipe():
         :return: None
         """
         self.height = random.randrange(50, 450)
-        self.top = self.height - self.PIPE_TOP.get_height()
+        self.top = self.height - geometry.PIPE_HEIGHT
         self.bottom = self.height + self.GAP
 
     def move(self):
@@ -145,15 +259,18 @@ class Pipe():
         win.blit(self.PIPE_BOTTOM, (self.x, self.bottom))
 
 
-    def collide(self, bird, win):
+    def collide(self, bird, win=None):
         """
         returns if a point is colliding with the pipe
         :param bird: Bird object
         :return: Bool
         """
+        if not self.USE_MASKS:
+            return bool(geometry.collide(bird.x, bird.y, self.x, self.height, self.GAP))
+
         bird_mask = bird.get_mask()
-        top_mask = pygame.mask.from_surface(self.PIPE_TOP)
-        bottom_mask = pygame.mask.from_surface(self.PIPE_BOTTOM)
+        top_mask = assets.mask(self.PIPE_TOP)
+        bottom_mask = assets.mask(self.PIPE_BOTTOM)
         top_offset = (self.x - bird.x, self.top - round(bird.y))
         bottom_offset = (self.x - bird.x, self.bottom - round(bird.y))
 
@@ -170,8 +287,8 @@ class Base:
     Represents the moving floor of the game
     """
     VEL = 5
-    WIDTH = base_img.get_width()
-    IMG = base_img
+    WIDTH = geometry.BASE_WIDTH
+    IMG = AssetAttribute("base")
 
     def __init__(self, y):
         self.y = y
@@ -200,10 +317,10 @@ class Base:
 
 
 def draw_window(win, birds,pipes, base,score):
-    win.blit(bg_img, (0, 0))
+    win.blit(assets.bg, (0, 0))
     for pipe in pipes:
         pipe.draw(win)
-    text = stat_font.render("Score"+str(score),1,(255,255,255))
+    text = assets.font.render("Score"+str(score),1,(255,255,255))
     win.blit(text, (WIN_WIDTH -10 - text.get_width(), 10))
 
     
@@ -219,8 +336,9 @@ def main(genomes, config):
     :param config: NEAT configuration file
     :return: None
     """
-    global win, gen
+    global gen
     gen += 1
+    win = get_window()
 
     # Lists to store birds, neural networks, and genomes
     nets = []
@@ -358,6 +476,13 @@ if __name__ == '__main__':
     # Determine path to configuration file. This path manipulation is
     # here so that the script will run successfully regardless of the
     # current working directory.
+    import argparse
+    parser = argparse.ArgumentParser(description='Evolve Flappy Bird players with NEAT.')
+    parser.add_argument('--geometry', action='store_true',
+                        help='collide with bounding boxes instead of pixel masks')
+    args = parser.parse_args()
+    Pipe.USE_MASKS = not args.geometry
+
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config.txt')
     run(config_path)
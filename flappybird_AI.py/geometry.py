@@ -0,0 +1,55 @@
+"""
+Headless collision geometry for Flappy Bird, no pygame surfaces needed.
+
+Sizes are those of the 2x scaled sprites. The bird is approximated by three
+boxes fitted to the opaque pixels of its animation frames, each pipe by its
+lip (the full sprite width, next to the gap) and its narrower body.
+All functions take scalars or NumPy arrays.
+"""
+
+BIRD_WIDTH = 68
+BIRD_HEIGHT = 48
+PIPE_WIDTH = 104
+PIPE_HEIGHT = 640
+PIPE_LIP = 48 # height of the wide lip at the gap end of a pipe
+PIPE_BODY_INSET = 4 # the body is 4 pixels narrower than the lip on either side
+BASE_WIDTH = 672
+GAP = 200
+
+# (left, top, right, bottom) relative to the bird's top-left corner, right/bottom exclusive
+BIRD_BOXES = (
+    (12, 0, 56, 12), # head
+    (0, 12, 68, 44), # body and wings
+    (19, 44, 41, 48), # belly
+)
+
+
+def _overlap(a0, a1, b0, b1):
+    # half-open intervals [a0, a1) and [b0, b1) intersect
+    return (a0 < b1) & (b0 < a1)
+
+
+def collide(bird_x, bird_y, pipe_x, pipe_height, gap=GAP):
+    """
+    True where a bird at (bird_x, bird_y) hits the pipe pair at pipe_x whose
+    gap spans pipe_height to pipe_height + gap (Pipe.height / Pipe.bottom).
+    """
+    bottom = pipe_height + gap
+    lip_x0, lip_x1 = pipe_x, pipe_x + PIPE_WIDTH
+    body_x0, body_x1 = pipe_x + PIPE_BODY_INSET, pipe_x + PIPE_WIDTH - PIPE_BODY_INSET
+    hit = False
+    for left, top, right, low in BIRD_BOXES:
+        x0, x1 = bird_x + left, bird_x + right
+        y0, y1 = bird_y + top, bird_y + low
+        # the pipes reach past the screen edges, so only the gap side bounds them
+        top_lip = _overlap(y0, y1, pipe_height - PIPE_LIP, pipe_height) & _overlap(x0, x1, lip_x0, lip_x1)
+        top_body = (y0 < pipe_height - PIPE_LIP) & _overlap(x0, x1, body_x0, body_x1)
+        bottom_lip = _overlap(y0, y1, bottom, bottom + PIPE_LIP) & _overlap(x0, x1, lip_x0, lip_x1)
+        bottom_body = (y1 > bottom + PIPE_LIP) & _overlap(x0, x1, body_x0, body_x1)
+        hit = hit | top_lip | top_body | bottom_lip | bottom_body
+    return hit
+
+
+def out_of_bounds(bird_y, floor=730):
+    # hits the ground or flies over the top of the screen
+    return (bird_y + BIRD_HEIGHT >= floor) | (bird_y < 0)
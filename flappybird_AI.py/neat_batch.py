@@ -0,0 +1,171 @@
+import numpy as np
+from neat.graphs import feed_forward_layers
+
+# NumPy versions of neat.activations, same clamping
+ACTIVATIONS = {
+    'sigmoid': lambda z: 1.0 / (1.0 + np.exp(-np.clip(5.0 * z, -60.0, 60.0))),
+    'tanh': lambda z: np.tanh(np.clip(2.5 * z, -60.0, 60.0)),
+    'sin': lambda z: np.sin(np.clip(5.0 * z, -60.0, 60.0)),
+    'gauss': lambda z: np.exp(-5.0 * np.clip(z, -3.4, 3.4) ** 2),
+    'relu': lambda z: np.maximum(z, 0.0),
+    'softplus': lambda z: 0.2 * np.log(1 + np.exp(np.clip(5.0 * z, -60.0, 60.0))),
+    'identity': lambda z: z,
+    'clamped': lambda z: np.clip(z, -1.0, 1.0),
+    'exp': lambda z: np.exp(np.clip(z, -60.0, 60.0)),
+    'abs': np.abs,
+    'hat': lambda z: np.maximum(0.0, 1 - np.abs(z)),
+    'square': lambda z: z ** 2,
+    'cube': lambda z: z ** 3,
+}
+
+
+class BatchNetwork:
+    """
+    All feed-forward networks of a generation compiled into padded, layer
+    ordered tensors, so one call computes the outputs of every genome.
+
+    Every genome gets a row of node values: slot 0 is a constant zero, then
+    the inputs, then for each layer (as in neat.graphs.feed_forward_layers) as
+    many slots as the widest genome has nodes in that layer. A layer is one
+    batched matrix product of its weights [genomes, nodes, slots so far] with
+    the values; padding nodes have no weights and are never read.
+    """
+
+    def __init__(self, n_inputs, layers, out_slots):
+        self.n_inputs = n_inputs
+        # per layer: (weights [G, M, S], bias [G, M], response [G, M], {activation: mask [G, M]})
+        self.layers = layers
+        self.out_slots = out_slots # [G, n_outputs]
+        self.n_slots = 1 + n_inputs + sum(w.shape[1] for w, _, _, _ in layers)
+
+    def __len__(self):
+        return len(self.out_slots)
+
+    @classmethod
+    def create(cls, genomes, config):
+        """ Receives a list of genomes and returns their BatchNetwork. """
+        gc = config.genome_config
+        inputs, outputs = gc.input_keys, gc.output_keys
+        compiled = []
+        for g in genomes:
+            connections = [cg.key for cg in g.connections.values() if cg.enabled]
+            layers = [sorted(layer) for layer in feed_forward_layers(inputs, outputs, connections)]
+            compiled.append((g, connections, layers))
+
+        n = len(genomes)
+        depth = max((len(layers) for _, _, layers in compiled), default=0)
+        widths = [max(len(layers[l]) if l < len(layers) else 0 for _, _, layers in compiled) for l in range(depth)]
+        offsets = np.cumsum([1 + len(inputs)] + widths)
+
+        tensors = [(np.zeros((n, m, offsets[l])), np.zeros((n, m)), np.zeros((n, m)), {})
+                   for l, m in enumerate(widths)]
+        out_slots = np.zeros((n, len(outputs)), dtype=np.int64)
+        for i, (g, connections, layers) in enumerate(compiled):
+            slot = {key: 1 + j for j, key in enumerate(inputs)}
+            for l, layer in enumerate(layers):
+                for j, node in enumerate(layer):
+                    slot[node] = offsets[l] + j
+            for l, layer in enumerate(layers):
+                weights, bias, response, masks = tensors[l]
+                for j, node in enumerate(layer):
+                    ng = g.nodes[node]
+                    if ng.aggregation != 'sum':
+                        raise ValueError('only sum aggregation can be batched, node {} uses {}'.format(node, ng.aggregation))
+                    if ng.activation not in ACTIVATIONS:
+                        raise ValueError('no batched version of the {} activation'.format(ng.activation))
+                    bias[i, j] = ng.bias
+                    response[i, j] = ng.response
+                    masks.setdefault(ng.activation, np.zeros((n, len(weights[0])), dtype=bool))[i, j] = True
+            for a, b in connections:
+                if b in slot and b not in inputs and a in slot:
+                    l = np.searchsorted(offsets, slot[b], side='right') - 1
+                    tensors[l][0][i, slot[b] - offsets[l], slot[a]] += g.connections[(a, b)].weight
+            # outputs that are never computed keep their initial 0.0, as in FeedForwardNetwork
+            out_slots[i] = [slot.get(key, 0) for key in outputs]
+        return cls(len(inputs), tensors, out_slots)
+
+    def subset(self, ids):
+        # BatchNetwork of the genomes `ids` only, e.g. the birds still alive
+        layers = [(w[ids], b[ids], r[ids], {name: mask[ids] for name, mask in masks.items()})
+                  for w, b, r, masks in self.layers]
+        return BatchNetwork(self.n_inputs, layers, self.out_slots[ids])
+
+    def activate(self, inputs, ids=None):
+        """
+        Outputs of every genome (or of the genomes `ids`) for one row of inputs each.
+        :param inputs: [G, n_inputs] array, G = len(ids) when ids are given
+        :param ids: optional indices of the genomes to evaluate
+        :return: [G, n_outputs] array
+        """
+        inputs = np.asarray(inputs, dtype=np.float64)
+        rows = len(inputs)
+        values = np.zeros((rows, self.n_slots))
+        values[:, 1:1 + self.n_inputs] = inputs
+        offset = 1 + self.n_inputs
+        for weights, bias, response, masks in self.layers:
+            if ids is not None:
+                weights, bias, response = weights[ids], bias[ids], response[ids]
+            m, s = weights.shape[1], weights.shape[2]
+            z = bias + response * np.matmul(weights, values[:, :s, None])[..., 0]
+            out = values[:, offset:offset + m]
+            for name, mask in masks.items():
+                if ids is not None:
+                    mask = mask[ids]
+                out[mask] = ACTIVATIONS[name](z[mask])
+            offset += m
+        out_slots = self.out_slots if ids is None else self.out_slots[ids]
+        return np.take_along_axis(values, out_slots, axis=1)
+
+
+def benchmark(config, n=1000, frames=100, mutations=20, seed=0):
+    """
+    Compares one frame of per-bird FeedForwardNetwork.activate calls with one
+    BatchNetwork.activate for n genomes that went through a number of random
+    mutations. Returns (seconds per frame looped, seconds per frame batched, max abs difference).
+    """
+    import random
+    import time
+    import neat
+
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    genomes = []
+    for key in range(n):
+        g = config.genome_type(key)
+        g.configure_new(config.genome_config)
+        for _ in range(mutations):
+            g.mutate(config.genome_config)
+        genomes.append(g)
+    nets = [neat.nn.FeedForwardNetwork.create(g, config) for g in genomes]
+    batch = BatchNetwork.create(genomes, config)
+    inputs = rng.uniform(0, 700, (frames, n, len(config.genome_config.input_keys)))
+
+    start = time.perf_counter()
+    looped = np.array([[net.activate(row) for net, row in zip(nets, frame.tolist())] for frame in inputs])
+    t_loop = (time.perf_counter() - start) / frames
+
+    batch.activate(inputs[0]) # warm up
+    start = time.perf_counter()
+    batched = np.array([batch.activate(frame) for frame in inputs])
+    t_batch = (time.perf_counter() - start) / frames
+    return t_loop, t_batch, float(np.abs(looped - batched).max())
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+    import neat
+
+    parser = argparse.ArgumentParser(description='Benchmark batched NEAT activation against the per-network loop.')
+    parser.add_argument('--genomes', type=int, nargs='+', default=[25, 250, 2500])
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--mutations', type=int, default=20, help='random mutations per genome, for varied topologies')
+    args = parser.parse_args()
+
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.txt'))
+    print('genomes   loop ms/frame  batch ms/frame  speedup  max abs diff')
+    for n in args.genomes:
+        t_loop, t_batch, diff = benchmark(config, n, args.frames, args.mutations)
+        print('{:>7}  {:>13.3f}  {:>14.3f}  {:>7.1f}  {:>12.2e}'.format(n, 1e3 * t_loop, 1e3 * t_batch, t_loop / t_batch, diff))
@@ -0,0 +1,227 @@
+import itertools
+import os
+import random
+import numpy as np
+import neat
+import geometry
+from neat_batch import BatchNetwork
+
+# game rules of flappybirdAI.main, kept here so the simulation never imports pygame
+BIRD_X = 230
+BIRD_Y = 350
+JUMP_VEL = -10.5
+GRAVITY = 3
+TERMINAL_DISPLACEMENT = 16
+PIPE_VEL = 5
+FIRST_PIPE_X = 700
+NEW_PIPE_X = 600
+FLOOR = 730
+
+# batched activation only pays off with more living birds than this
+LOOP_BELOW = 16
+
+
+class Population:
+    """
+    Headless flappybirdAI.main for a whole population at once. The state of
+    the living birds is kept in NumPy arrays and every frame moves, feeds and
+    collides all of them in a few vectorized operations; pipes use the
+    bounding-box collisions of geometry.py.
+    """
+
+    def __init__(self, n):
+        self.n = n
+
+    def run(self, activate, rng=random, max_score=None, course=None, observer=None):
+        """
+        Plays one game with n birds and returns (fitness, score).
+        :param activate: function(ids, inputs) -> output per bird, ids are the living birds' indices
+            and inputs their (y, |y - pipe height|, |y - pipe bottom|) rows
+        :param rng: source of the pipe heights (randrange)
+        :param course: courses.Course with fixed pipe heights, used instead of rng
+        :param observer: called after every frame with (ids, y, vel, pipes, score) of the living birds,
+            e.g. a spectator.Spectator
+        :param max_score: stop once this many pipes are passed, None plays until all birds are dead
+        :return: fitness array of length n, number of pipes passed
+        """
+        fitness = np.zeros(self.n)
+        # state of the living birds only, compacted whenever birds die
+        ids = np.arange(self.n)
+        y = np.full(self.n, float(BIRD_Y))
+        vel = np.zeros(self.n)
+        tick = np.zeros(self.n, dtype=np.int64)
+
+        if course is not None:
+            heights = (course[i] for i in itertools.count())
+        else:
+            heights = iter(lambda: rng.randrange(50, 450), None)
+        # pipes: x position, gap top, passed flag
+        pipes = [[FIRST_PIPE_X, next(heights), False]]
+        score = 0
+
+        while len(ids):
+            pipe = pipes[1] if len(pipes) > 1 and BIRD_X > pipes[0][0] + geometry.PIPE_WIDTH else pipes[0]
+
+            # Bird.move for every bird
+            tick += 1
+            displacement = vel * tick + 0.5 * GRAVITY * tick ** 2
+            np.minimum(displacement, TERMINAL_DISPLACEMENT, out=displacement)
+            displacement[displacement < 0] -= 2
+            y += displacement
+            fitness[ids] += 0.1
+
+            inputs = np.stack([y, np.abs(y - pipe[1]), np.abs(y - (pipe[1] + geometry.GAP))], axis=1)
+            jump = np.asarray(activate(ids, inputs)) > 0.5
+            vel[jump] = JUMP_VEL
+            tick[jump] = 0
+
+            add_pipe = False
+            removed = []
+            for p in pipes:
+                # all birds share x, pipes that are not level with them can't be hit
+                if p[0] < BIRD_X + geometry.BIRD_WIDTH and BIRD_X < p[0] + geometry.PIPE_WIDTH:
+                    hit = geometry.collide(BIRD_X, y, p[0], p[1])
+                    if hit.any():
+                        fitness[ids[hit]] -= 1
+                        ids, y, vel, tick = ids[~hit], y[~hit], vel[~hit], tick[~hit]
+                if len(ids) and not p[2] and p[0] < BIRD_X:
+                    p[2] = True
+                    add_pipe = True
+                if p[0] + geometry.PIPE_WIDTH < 0:
+                    removed.append(p)
+                p[0] -= PIPE_VEL
+
+            if add_pipe:
+                score += 1
+                fitness[ids] += 5
+                pipes.append([NEW_PIPE_X, next(heights), False])
+            for p in removed:
+                pipes.remove(p)
+
+            alive = ~geometry.out_of_bounds(y, FLOOR)
+            ids, y, vel, tick = ids[alive], y[alive], vel[alive], tick[alive]
+            if observer is not None and len(ids):
+                observer(ids, y, vel, pipes, score)
+
+            if max_score is not None and score >= max_score:
+                break
+
+        return fitness, score
+
+
+def net_activate(nets):
+    # activate() for Population.run from one neat network per bird
+    def activate(ids, inputs):
+        return np.array([nets[i].activate(row)[0] for i, row in zip(ids, inputs.tolist())])
+    return activate
+
+
+def batch_activate(net, genomes, config, loop_below=LOOP_BELOW):
+    # activate() for Population.run from a BatchNetwork of the whole population;
+    # the tensors are cut down to the living birds whenever half of them died,
+    # and the last few birds go back to one neat network each, which is cheaper
+    # than a batched call per frame
+    current = {'net': net, 'ids': np.arange(len(net))}
+    nets = {}
+
+    def activate(ids, inputs):
+        if len(ids) < loop_below:
+            for i in ids:
+                if i not in nets:
+                    nets[i] = neat.nn.FeedForwardNetwork.create(genomes[i], config)
+            return np.array([nets[i].activate(row)[0] for i, row in zip(ids.tolist(), inputs.tolist())])
+        if len(ids) <= len(current['ids']) // 2:
+            current['net'] = current['net'].subset(np.searchsorted(current['ids'], ids))
+            current['ids'] = ids
+        if len(ids) == len(current['ids']):
+            return current['net'].activate(inputs)[:, 0]
+        return current['net'].activate(inputs, np.searchsorted(current['ids'], ids))[:, 0]
+    return activate
+
+
+def eval_genomes(genomes, config, max_score=None, batched=True, observer=None):
+    """
+    NEAT fitness function: scores all genomes in one headless game.
+    :param genomes: list of (genome_id, genome) from NEAT
+    :param config: NEAT configuration
+    :param batched: evaluate all networks of a frame in one BatchNetwork call
+    :param observer: per-frame callback passed on to Population.run
+    :return: None
+    """
+    genomes = [g for _, g in genomes]
+    if batched:
+        activate = batch_activate(BatchNetwork.create(genomes, config), genomes, config)
+    else:
+        activate = net_activate([neat.nn.FeedForwardNetwork.create(g, config) for g in genomes])
+    fitness, _ = Population(len(genomes)).run(activate, max_score=max_score, observer=observer)
+    for g, f in zip(genomes, fitness):
+        g.fitness = float(f)
+
+
+def run(config_file, generations=50, pop_size=None, max_score=None, batched=True,
+        courses=0, course_seed=0, workers=0, spectator=None):
+    """
+    runs NEAT headless with the vectorized population simulator
+    :param config_file: location of config file
+    :param generations: number of generations
+    :param pop_size: overrides pop_size of the config file
+    :param max_score: end a game once this many pipes are passed
+    :param batched: batched network evaluation, False activates one neat network per bird
+    :param courses: score every genome on this many seeded courses (course_seed, course_seed + 1, ...)
+        with cached fitness, 0 plays a new random course every generation
+    :param workers: processes for the courses
+    :param spectator: spectator.Spectator that is shown the games (not with courses)
+    :return: best genome
+    """
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation,
+                                config_file)
+    if pop_size is not None:
+        config.pop_size = pop_size
+    p = neat.Population(config)
+    p.add_reporter(neat.StdOutReporter(True))
+    p.add_reporter(neat.StatisticsReporter())
+    if courses:
+        from courses import CourseEvaluator
+        evaluator = CourseEvaluator(range(course_seed, course_seed + courses), max_score, workers)
+        try:
+            winner = p.run(evaluator, generations)
+        finally:
+            evaluator.close()
+        print('Fitness cache: {} hits, {} genomes simulated'.format(evaluator.cache.hits, evaluator.simulated))
+    else:
+        def fitness(genomes, config):
+            if spectator is not None:
+                spectator.generation += 1
+            eval_genomes(genomes, config, max_score, batched, spectator)
+        winner = p.run(fitness, generations)
+    print('\nBest genome:\n{!s}'.format(winner))
+    return winner
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Headless NEAT training on the vectorized Flappy Bird simulator.')
+    parser.add_argument('--generations', type=int, default=50)
+    parser.add_argument('--pop-size', type=int, default=None, help='overrides pop_size in config.txt')
+    parser.add_argument('--max-score', type=int, default=None, help='end a game after this many pipes')
+    parser.add_argument('--per-net', action='store_true', help='activate one neat network per bird instead of batched')
+    parser.add_argument('--courses', type=int, default=0,
+                        help='average fitness over this many seeded courses, with a fitness cache')
+    parser.add_argument('--course-seed', type=int, default=0, help='seed of the first course')
+    parser.add_argument('--workers', type=int, default=0, help='processes that play the courses in parallel')
+    parser.add_argument('--spectate', action='store_true',
+                        help='show the best living bird in a separate window, training does not wait for it')
+    parser.add_argument('--fps', type=int, default=30, help='frame rate of the spectator window')
+    args = parser.parse_args()
+    spectator = None
+    if args.spectate:
+        from spectator import Spectator
+        spectator = Spectator(args.fps)
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.txt')
+    try:
+        run(config_path, args.generations, args.pop_size, args.max_score, not args.per_net,
+            args.courses, args.course_seed, args.workers, spectator)
+    finally:
+        if spectator is not None:
+            spectator.close()
@@ -0,0 +1,138 @@
+import multiprocessing as mp
+import time
+import numpy as np
+
+# snapshot layout: one float64 row per frame
+GENERATION, SCORE, ALIVE, BIRD_Y, N_PIPES, PIPES = range(6)
+MAX_PIPES = 3 # (x, height) pairs from PIPES on
+SIZE = PIPES + 2 * MAX_PIPES
+
+
+class SnapshotChannel:
+    """
+    Latest-value channel in shared memory: the writer overwrites one snapshot
+    in place, readers copy whatever is newest. A sequence counter that is odd
+    while a write is in progress (a seqlock) lets readers detect torn reads
+    without the writer ever waiting.
+    """
+
+    def __init__(self, size, ctx=None):
+        ctx = ctx or mp.get_context('spawn')
+        self.size = size
+        self._seq = ctx.RawValue('q', 0)
+        self._data = ctx.RawArray('d', size)
+        self._array = np.frombuffer(self._data)
+
+    def __getstate__(self):
+        return {'size': self.size, '_seq': self._seq, '_data': self._data}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._array = np.frombuffer(self._data)
+
+    def publish(self, values):
+        self._seq.value += 1
+        self._array[:len(values)] = values
+        self._seq.value += 1
+
+    def read(self, last_seq=-1):
+        """
+        :return: (sequence number, copy of the snapshot), the snapshot is None
+            when nothing new was published since last_seq
+        """
+        while True:
+            seq = self._seq.value
+            if seq == last_seq or seq == 0:
+                return seq, None
+            if seq % 2:
+                continue
+            snapshot = self._array.copy()
+            if self._seq.value == seq:
+                return seq, snapshot
+
+
+class Spectator:
+    """
+    Population.run observer that publishes one bird per frame to a viewer
+    process. The viewer draws at its own frame rate and skips the frames it
+    missed, training never waits for it.
+    """
+
+    def __init__(self, fps=30, select=None):
+        """
+        :param fps: viewer frame rate
+        :param select: index of the genome to follow while it lives, None follows the
+            longest living bird
+        """
+        self.select = select
+        self.generation = 0
+        self.channel = SnapshotChannel(SIZE)
+        self._snapshot = np.zeros(SIZE)
+        # frames newer than the viewer can show are not even copied: at most 2 * fps snapshots a second
+        self._interval = 0.5 / fps
+        self._next = 0.0
+        self._process = mp.get_context('spawn').Process(target=view, args=(self.channel, fps), daemon=True)
+        self._process.start()
+
+    def __call__(self, ids, y, vel, pipes, score):
+        now = time.perf_counter()
+        if now < self._next:
+            return
+        self._next = now + self._interval
+        i = 0
+        if self.select is not None:
+            i = min(int(np.searchsorted(ids, self.select)), len(ids) - 1)
+            if ids[i] != self.select:
+                i = 0
+        s = self._snapshot
+        s[GENERATION], s[SCORE], s[ALIVE], s[BIRD_Y] = self.generation, score, len(ids), y[i]
+        visible = pipes[:MAX_PIPES]
+        s[N_PIPES] = len(visible)
+        for j, (x, height, _) in enumerate(visible):
+            s[PIPES + 2 * j] = x
+            s[PIPES + 2 * j + 1] = height
+        self.channel.publish(s)
+
+    def close(self):
+        self._process.terminate()
+        self._process.join()
+
+
+def view(channel, fps=30):
+    # viewer process: redraws the newest snapshot with the game's sprites
+    import pygame
+    import flappybirdAI as game
+    import population
+
+    win = game.get_window()
+    clock = pygame.time.Clock()
+    base = game.Base(population.FLOOR)
+    bird = game.Bird(population.BIRD_X, population.BIRD_Y)
+    seq = -1
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+
+        seq, snapshot = channel.read(seq)
+        if snapshot is not None:
+            y = snapshot[BIRD_Y]
+            # Bird.move's tilt: nose up while climbing, then tipping over
+            if y < bird.y:
+                bird.tilt = bird.MAX_ROTATION
+            elif bird.tilt > -90:
+                bird.tilt -= bird.ROT_VEL
+            bird.y = y
+            pipes = []
+            for j in range(int(snapshot[N_PIPES])):
+                pipe = game.Pipe(snapshot[PIPES + 2 * j])
+                pipe.height = int(snapshot[PIPES + 2 * j + 1])
+                pipe.top = pipe.height - pipe.PIPE_TOP.get_height()
+                pipe.bottom = pipe.height + pipe.GAP
+                pipes.append(pipe)
+            base.move()
+            pygame.display.set_caption('Flappy Bird - generation {} - {} alive'.format(
+                int(snapshot[GENERATION]), int(snapshot[ALIVE])))
+            game.draw_window(win, [bird], pipes, base, int(snapshot[SCORE]))
+        clock.tick(fps)
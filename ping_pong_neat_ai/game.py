@@ -1,10 +1,11 @@
+import argparse
 import pygame
 import neat
 from ball import Ball
 from paddle import Paddle
 import os
 
-# Initialize Pygame
+# Initialize Pygame (the window is only opened by Display)
 pygame.init()
 
 # Screen dimensions
@@ -15,38 +16,72 @@ SCREEN_HEIGHT = 600
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 
-# Initialize screen
-screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-pygame.display.set_caption("Ping Pong Game")
-
-# Clock for controlling frame rate
-clock = pygame.time.Clock()
+# Frame rate of the game window and simulation steps per genome
+FPS = 60
+STEPS = 1000
 
 # Create ball and paddles
 ball = Ball(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2, 10, WHITE, 5, 5)
 paddle_left = Paddle(20, SCREEN_HEIGHT // 2 - 60, 10, 120, WHITE, 7)
 paddle_right = Paddle(SCREEN_WIDTH - 30, SCREEN_HEIGHT // 2 - 60, 10, 120, WHITE, 7)
 
-# Score variables
-left_score = 0
-right_score = 0
+# Initialize generation counter
+gen = 0  # Generation counter
 
-# Fonts for displaying score and AI label
-font = pygame.font.Font(None, 74)
-ai_font = pygame.font.Font(None, 30)
 
-# Initialize the population and create the configuration
-config_path = os.path.join(os.path.dirname(__file__), "config-feedforward.txt")
-config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                            neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+class Display:
+    """ The game window: screen, clock and fonts, text rendered only when it changes """
+
+    def __init__(self):
+        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+        pygame.display.set_caption("Ping Pong Game")
+        # Clock for controlling frame rate
+        self.clock = pygame.time.Clock()
+        # Fonts for displaying score and AI label
+        self.font = pygame.font.Font(None, 74)
+        self.ai_text = pygame.font.Font(None, 30).render("AI", True, WHITE)
+        self._scores = {}
+
+    def score_text(self, score):
+        text = self._scores.get(score)
+        if text is None:
+            text = self._scores[score] = self.font.render(str(score), True, WHITE)
+        return text
+
+    def draw(self, left_score, right_score):
+        screen = self.screen
+        screen.fill(BLACK)
+
+        # Draw everything
+        ball.draw(screen)
+        paddle_left.draw(screen)
+        paddle_right.draw(screen)
+
+        # Display the scores
+        left_score_text = self.score_text(left_score)
+        right_score_text = self.score_text(right_score)
+        screen.blit(left_score_text, (SCREEN_WIDTH // 4 - left_score_text.get_width() // 2, 20))
+        screen.blit(right_score_text, (SCREEN_WIDTH * 3 // 4 - right_score_text.get_width() // 2, 20))
+
+        # Display "AI" label below right score
+        screen.blit(self.ai_text, (SCREEN_WIDTH * 3 // 4 - self.ai_text.get_width() // 2, 100))
+
+        # Update the display
+        pygame.display.flip()
 
-# Initialize generation counter
-gen = 0  # Generation counter
 
 # Define the fitness function for NEAT
-def eval_genomes(genomes, config):
+def eval_genomes(genomes, config, display=None, spectator=None):
+    """
+    Plays STEPS frames per genome. With a Display the game is drawn and capped
+    at FPS and the left paddle follows the W/S keys; without one it runs
+    headless at full speed, optionally publishing the frames of the genome the
+    spectator watches.
+    """
     global gen
     gen += 1
+    if spectator is not None:
+        spectator.start_generation(genomes)
     for genome_id, genome in genomes:
         net = neat.nn.FeedForwardNetwork.create(genome, config)
         left_score = 0
@@ -55,21 +90,20 @@ def eval_genomes(genomes, config):
         ball.speed_x, ball.speed_y = 5, 5
 
         # Run the game for a set time (simulation steps per genome)
-        for _ in range(1000):
-            screen.fill(BLACK)
-
-            # Process events to ensure key inputs are handled
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    quit()
-
-            # Handle user input for the left paddle (Player-controlled)
-            keys = pygame.key.get_pressed()
-            if keys[pygame.K_w] and paddle_left.y > 0:  # W key for up
-                paddle_left.move("up", SCREEN_HEIGHT)
-            if keys[pygame.K_s] and paddle_left.y < SCREEN_HEIGHT - paddle_left.height:  # S key for down
-                paddle_left.move("down", SCREEN_HEIGHT)
+        for _ in range(STEPS):
+            if display is not None:
+                # Process events to ensure key inputs are handled
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        pygame.quit()
+                        quit()
+
+                # Handle user input for the left paddle (Player-controlled)
+                keys = pygame.key.get_pressed()
+                if keys[pygame.K_w] and paddle_left.y > 0:  # W key for up
+                    paddle_left.move("up", SCREEN_HEIGHT)
+                if keys[pygame.K_s] and paddle_left.y < SCREEN_HEIGHT - paddle_left.height:  # S key for down
+                    paddle_left.move("down", SCREEN_HEIGHT)
 
             # Handle paddle movement using the neural network for the right paddle (AI-controlled)
             output = net.activate((ball.x, ball.y, paddle_right.y))  # Ball position and right paddle position as inputs
@@ -96,34 +130,48 @@ def eval_genomes(genomes, config):
                 ball.x, ball.y = SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2
                 ball.speed_x *= -1  # Reset ball direction
 
-            # Draw everything
-            ball.draw(screen)
-            paddle_left.draw(screen)
-            paddle_right.draw(screen)
-
-            # Display the scores
-            left_score_text = font.render(str(left_score), True, WHITE)
-            right_score_text = font.render(str(right_score), True, WHITE)
-            screen.blit(left_score_text, (SCREEN_WIDTH // 4 - left_score_text.get_width() // 2, 20))
-            screen.blit(right_score_text, (SCREEN_WIDTH * 3 // 4 - right_score_text.get_width() // 2, 20))
-
-            # Display "AI" label below right score
-            ai_text = ai_font.render("AI", True, WHITE)
-            screen.blit(ai_text, (SCREEN_WIDTH * 3 // 4 - ai_text.get_width() // 2, 100))
-
-            # Update the display
-            pygame.display.flip()
-
-            # Cap the frame rate
-            clock.tick(60)
+            if display is not None:
+                display.draw(left_score, right_score)
+                # Cap the frame rate
+                display.clock.tick(FPS)
+            elif spectator is not None:
+                spectator.publish(gen, genome_id, left_score, right_score, ball, paddle_left, paddle_right)
 
         # The fitness is how well the AI did (right player score)
         genome.fitness = right_score
 
-# Initialize the population
-population = neat.Population(config)
-
-# Run the NEAT algorithm
-winner = population.run(eval_genomes, 50)  # Run for 50 generations
 
-pygame.quit()
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evolve a ping pong paddle with NEAT.')
+    parser.add_argument('--headless', action='store_true', help='train at full speed without a window')
+    parser.add_argument('--spectate', action='store_true',
+                        help='train headless and watch in a separate window that never slows training down')
+    parser.add_argument('--watch', type=int, default=None, metavar='ID',
+                        help='with --spectate, watch this genome instead of the best of the previous generation')
+    parser.add_argument('--generations', type=int, default=50)
+    args = parser.parse_args()
+
+    # Initialize the population and create the configuration
+    config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config-feedforward.txt")
+    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+
+    display = spectator = None
+    if args.spectate:
+        from spectator import Spectator
+        spectator = Spectator(FPS, args.watch)
+    elif not args.headless:
+        display = Display()
+
+    # Initialize the population
+    population = neat.Population(config)
+
+    # Run the NEAT algorithm
+    try:
+        winner = population.run(lambda genomes, config: eval_genomes(genomes, config, display, spectator),
+                                args.generations)  # Run for 50 generations
+    finally:
+        if spectator is not None:
+            spectator.close()
+
+    pygame.quit()
@@ -0,0 +1,123 @@
+import multiprocessing as mp
+import time
+import numpy as np
+
+# snapshot layout: one float64 row per frame
+GENERATION, GENOME, LEFT_SCORE, RIGHT_SCORE, BALL_X, BALL_Y, LEFT_Y, RIGHT_Y = range(8)
+SIZE = 8
+
+
+class SnapshotChannel:
+    """
+    Latest-value channel in shared memory: the writer overwrites one snapshot
+    in place, readers copy whatever is newest. A sequence counter that is odd
+    while a write is in progress (a seqlock) lets readers detect torn reads
+    without the writer ever waiting.
+    """
+
+    def __init__(self, size, ctx=None):
+        ctx = ctx or mp.get_context('spawn')
+        self.size = size
+        self._seq = ctx.RawValue('q', 0)
+        self._data = ctx.RawArray('d', size)
+        self._array = np.frombuffer(self._data)
+
+    def __getstate__(self):
+        return {'size': self.size, '_seq': self._seq, '_data': self._data}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._array = np.frombuffer(self._data)
+
+    def publish(self, values):
+        self._seq.value += 1
+        self._array[:len(values)] = values
+        self._seq.value += 1
+
+    def read(self, last_seq=-1):
+        # (sequence number, copy of the newest snapshot or None if nothing new since last_seq)
+        while True:
+            seq = self._seq.value
+            if seq == last_seq or seq == 0:
+                return seq, None
+            if seq % 2:
+                continue
+            snapshot = self._array.copy()
+            if self._seq.value == seq:
+                return seq, snapshot
+
+
+class Spectator:
+    """
+    Publishes the game of one genome per generation to a viewer process that
+    draws at its own frame rate and skips what it missed, so headless training
+    runs at full speed with or without it.
+    """
+
+    def __init__(self, fps=60, select=None):
+        """
+        :param fps: viewer frame rate
+        :param select: id of the genome to watch while it is in the population, None
+            watches the best genome carried over from the previous generation
+        """
+        self.select = select
+        self.genome_id = None
+        self.channel = SnapshotChannel(SIZE)
+        self._snapshot = np.zeros(SIZE)
+        # frames newer than the viewer can show are not even copied: at most 2 * fps snapshots a second
+        self._interval = 0.5 / fps
+        self._next = 0.0
+        self._process = mp.get_context('spawn').Process(target=view, args=(self.channel, fps), daemon=True)
+        self._process.start()
+
+    def start_generation(self, genomes):
+        # picks the genome to watch: the selected one, else the fittest elite (only genomes kept
+        # from the previous generation have a fitness yet), else the first
+        ids = [genome_id for genome_id, _ in genomes]
+        if self.select in ids:
+            self.genome_id = self.select
+            return
+        scored = [(genome.fitness, genome_id) for genome_id, genome in genomes if genome.fitness is not None]
+        self.genome_id = max(scored)[1] if scored else ids[0]
+
+    def publish(self, generation, genome_id, left_score, right_score, ball, paddle_left, paddle_right):
+        if genome_id != self.genome_id:
+            return
+        now = time.perf_counter()
+        if now < self._next:
+            return
+        self._next = now + self._interval
+        s = self._snapshot
+        s[GENERATION], s[GENOME] = generation, genome_id
+        s[LEFT_SCORE], s[RIGHT_SCORE] = left_score, right_score
+        s[BALL_X], s[BALL_Y] = ball.x, ball.y
+        s[LEFT_Y], s[RIGHT_Y] = paddle_left.y, paddle_right.y
+        self.channel.publish(s)
+
+    def close(self):
+        self._process.terminate()
+        self._process.join()
+
+
+def view(channel, fps=60):
+    # viewer process: its own window, redrawn from the newest snapshot
+    import pygame
+    import game
+
+    display = game.Display()
+    ball, paddle_left, paddle_right = game.ball, game.paddle_left, game.paddle_right
+    seq = -1
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+
+        seq, snapshot = channel.read(seq)
+        if snapshot is not None:
+            ball.x, ball.y = snapshot[BALL_X], snapshot[BALL_Y]
+            paddle_left.y, paddle_right.y = snapshot[LEFT_Y], snapshot[RIGHT_Y]
+            pygame.display.set_caption('Ping Pong Game - generation {} - genome {}'.format(
+                int(snapshot[GENERATION]), int(snapshot[GENOME])))
+            display.draw(int(snapshot[LEFT_SCORE]), int(snapshot[RIGHT_SCORE]))
+        display.clock.tick(fps)
@@ -1,147 +1,395 @@
+import argparse
+import time
 import torch
 import random
 import numpy as np
-from collections import deque
-from game import SnakeGameAI, Direction, Point
+from contextlib import nullcontext
+from game import SnakeGameAI, action_code, get_state
 from model import Linear_QNet, QTrainer
-from helper import plot
+from memory import ReplayBuffer, PrioritizedReplayBuffer, MmapReplayBuffer, NStepBuffer
+from metrics import MetricsLogger
+from checkpoint import save_checkpoint, load_checkpoint, CHECKPOINT_PATH
+from profiler import Profiler
+from scheduler import UpdateScheduler
+from prefetch import BatchPrefetcher
 
 MAX_MEMORY = 100_000
 BATCH_SIZE = 1000
 LR = 0.001
+GAMMA = 0.9
+EPSILON_START = 80 # random moves while n_games < EPSILON_START
 
 class Agent:
 
-    def __init__(self):
+    def __init__(self, prioritized=False, target_update=0, tau=None, double=False, n_step=1,
+                 lr=LR, gamma=GAMMA, batch_size=BATCH_SIZE, max_memory=MAX_MEMORY, epsilon_start=EPSILON_START,
+                 replay_dir=None):
         self.n_games = 0
+        self.n_steps = 0
+        self.scores = [] # score of every finished game
+        self.total_score = 0
+        self.record = 0
         self.epsilon = 0 # randomness
-        self.gamma = 0.9 # discount rate
-        self.memory = deque(maxlen=MAX_MEMORY) # popleft()
+        self.epsilon_start = epsilon_start
+        self.gamma = gamma # discount rate
+        self.batch_size = batch_size
+        if prioritized:
+            if replay_dir is not None:
+                raise ValueError('prioritized replay keeps its priorities in memory, use it without replay_dir')
+            self.memory = PrioritizedReplayBuffer(max_memory, 11)
+        elif replay_dir is not None:
+            self.memory = MmapReplayBuffer(max_memory, 11, directory=replay_dir) # on disk, reopened on restart
+        else:
+            self.memory = ReplayBuffer(max_memory, 11) # overwrites the oldest when full
         self.model = Linear_QNet(11, 256, 3)
-        self.trainer = QTrainer(self.model, lr=LR, gamma=self.gamma)
-
-
-    def get_state(self, game):
-        head = game.snake[0]
-        point_l = Point(head.x - 20, head.y)
-        point_r = Point(head.x + 20, head.y)
-        point_u = Point(head.x, head.y - 20)
-        point_d = Point(head.x, head.y + 20)
-        
-        dir_l = game.direction == Direction.LEFT
-        dir_r = game.direction == Direction.RIGHT
-        dir_u = game.direction == Direction.UP
-        dir_d = game.direction == Direction.DOWN
-
-        state = [
-            # Danger straight
-            (dir_r and game.is_collision(point_r)) or 
-            (dir_l and game.is_collision(point_l)) or 
-            (dir_u and game.is_collision(point_u)) or 
-            (dir_d and game.is_collision(point_d)),
-
-            # Danger right
-            (dir_u and game.is_collision(point_r)) or 
-            (dir_d and game.is_collision(point_l)) or 
-            (dir_l and game.is_collision(point_u)) or 
-            (dir_r and game.is_collision(point_d)),
-
-            # Danger left
-            (dir_d and game.is_collision(point_r)) or 
-            (dir_u and game.is_collision(point_l)) or 
-            (dir_r and game.is_collision(point_u)) or 
-            (dir_l and game.is_collision(point_d)),
-            
-            # Move direction
-            dir_l,
-            dir_r,
-            dir_u,
-            dir_d,
-            
-            # Food location 
-            game.food.x < game.head.x,  # food left
-            game.food.x > game.head.x,  # food right
-            game.food.y < game.head.y,  # food up
-            game.food.y > game.head.y  # food down
-            ]
-
-        return np.array(state, dtype=int)
+        self.trainer = QTrainer(self.model, lr=lr, gamma=self.gamma, target_update=target_update,
+                                tau=tau, double=double, n_step=n_step)
+        self.n_step_buffer = NStepBuffer(n_step, self.gamma) if n_step > 1 else None
+        self.prefetcher = None
+        self.memory_lock = nullcontext() # held while writing to memory, a real lock while prefetching
+
+    @property
+    def hyperparams(self):
+        return {'lr': self.trainer.lr, 'gamma': self.gamma, 'batch_size': self.batch_size,
+                'epsilon_start': self.epsilon_start}
+
+    def set_hyperparams(self, lr=None, gamma=None, batch_size=None, epsilon_start=None):
+        # change hyperparameters of a live agent, e.g. after a population-based training exploit step
+        if lr is not None:
+            self.trainer.lr = lr
+            for group in self.trainer.optimizer.param_groups:
+                group['lr'] = lr
+        if gamma is not None:
+            self.gamma = self.trainer.gamma = gamma
+            if self.n_step_buffer is not None:
+                self.n_step_buffer.gamma = gamma
+        if batch_size is not None:
+            if self.prefetcher is not None and self.prefetcher.batch_size == self.batch_size:
+                self.prefetcher.batch_size = batch_size
+            self.batch_size = batch_size
+        if epsilon_start is not None:
+            self.epsilon_start = epsilon_start
+
+
+    @staticmethod
+    def get_state(game):
+        return get_state(game)
 
     def remember(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done)) # popleft if MAX_MEMORY is reached
+        with self.memory_lock:
+            if self.n_step_buffer is None:
+                self.memory.push(state, action_code(action), reward, next_state, done)
+            else:
+                for transition in self.n_step_buffer.push(state, action_code(action), reward, next_state, done):
+                    self.memory.push(*transition)
 
-    def train_long_memory(self):
-        if len(self.memory) > BATCH_SIZE:
-            mini_sample = random.sample(self.memory, BATCH_SIZE) # list of tuples
-        else:
-            mini_sample = self.memory
+    def start_prefetch(self, batch_size=None, depth=2):
+        # sample minibatches of batch_size on a background thread from now on
+        self.prefetcher = BatchPrefetcher(self.memory, batch_size or self.batch_size, depth)
+        self.memory_lock = self.prefetcher.lock
 
-        states, actions, rewards, next_states, dones = zip(*mini_sample)
-        self.trainer.train_step(states, actions, rewards, next_states, dones)
-        #for state, action, reward, nexrt_state, done in mini_sample:
-        #    self.trainer.train_step(state, action, reward, next_state, done)
+    def stop_prefetch(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher = None
+            self.memory_lock = nullcontext()
+
+    def train_long_memory(self, batch_size=None):
+        batch_size = batch_size or self.batch_size
+        if self.prefetcher is not None:
+            batch = self.prefetcher.get(batch_size)
+        else:
+            batch = self.memory.sample(batch_size)
+        loss, td_errors = self.trainer.train_step(batch.states, batch.actions, batch.rewards,
+                                                  batch.next_states, batch.dones, batch.weights)
+        with self.memory_lock:
+            self.memory.update_priorities(batch.indices, td_errors)
+        return loss
 
     def train_short_memory(self, state, action, reward, next_state, done):
-        self.trainer.train_step(state, action, reward, next_state, done)
+        loss, _ = self.trainer.train_step(state, action_code(action), reward, next_state, done, gamma=self.gamma)
+        return loss
 
     def get_action(self, state):
         # random moves: tradeoff exploration / exploitation
-        self.epsilon = 80 - self.n_games
+        self.epsilon = self.epsilon_start - self.n_games
         final_move = [0,0,0]
         if random.randint(0, 200) < self.epsilon:
             move = random.randint(0, 2)
             final_move[move] = 1
         else:
-            state0 = torch.tensor(state, dtype=torch.float)
-            prediction = self.model(state0)
+            state0 = torch.from_numpy(state).float()
+            with torch.no_grad():
+                prediction = self.model(state0)
             move = torch.argmax(prediction).item()
             final_move[move] = 1
 
         return final_move
 
+    def get_actions(self, states):
+        # batched get_action for VecSnakeGame: one forward pass, returns int codes [N]
+        self.epsilon = self.epsilon_start - self.n_games
+        with torch.no_grad():
+            prediction = self.model(torch.as_tensor(states, dtype=torch.float))
+        moves = torch.argmax(prediction, dim=1).numpy()
+        explore = np.random.randint(0, 201, len(moves)) < self.epsilon
+        moves[explore] = np.random.randint(0, 3, explore.sum())
+        return moves
+
 
-def train():
-    plot_scores = []
-    plot_mean_scores = []
-    total_score = 0
-    record = 0
-    agent = Agent()
-    game = SnakeGameAI()
+def train(agent=None, render=False, max_games=None, target_score=None, window=100, quiet=False, metrics=None,
+          checkpoint=CHECKPOINT_PATH, checkpoint_every=0, profiler=None, profile_every=0, profile_file=None,
+          scheduler=None, short_memory=True, recorder=None):
+    # runs until max_games are played or the mean of the last `window` scores reaches
+    # target_score (forever by default); quiet turns off printing and saving,
+    # metrics is an optional MetricsLogger that receives one row per game,
+    # the full training state is written to the checkpoint directory every checkpoint_every games,
+    # profiler times every phase and reports every profile_every games,
+    # with an UpdateScheduler minibatch updates follow its step cadence instead of
+    # one long memory update per game, short_memory=False drops the single-sample updates,
+    # recorder is an optional EpisodeRecorder that logs every game as seed + actions
+    if agent is None:
+        agent = Agent()
+    prof = profiler or Profiler(enabled=False)
+    game = SnakeGameAI(render=render, seed=recorder.start() if recorder is not None else None)
+    game_start, game_steps = time.perf_counter(), 0
+    loss = None
     while True:
         # get old state
-        state_old = agent.get_state(game)
+        with prof.section('get_state'):
+            state_old = agent.get_state(game)
 
         # get move
-        final_move = agent.get_action(state_old)
+        with prof.section('get_action'):
+            final_move = agent.get_action(state_old)
 
         # perform move and get new state
-        reward, done, score = game.play_step(final_move)
-        state_new = agent.get_state(game)
+        with prof.section('play_step'):
+            reward, done, score = game.play_step(final_move)
+        if recorder is not None:
+            recorder.record(action_code(final_move))
+        with prof.section('get_state'):
+            state_new = agent.get_state(game)
+        agent.n_steps += 1
+        game_steps += 1
 
         # train short memory
-        agent.train_short_memory(state_old, final_move, reward, state_new, done)
+        if short_memory:
+            with prof.section('train_short_memory'):
+                agent.train_short_memory(state_old, final_move, reward, state_new, done)
 
         # remember
-        agent.remember(state_old, final_move, reward, state_new, done)
+        with prof.section('remember'):
+            agent.remember(state_old, final_move, reward, state_new, done)
+
+        # train on minibatches every K steps
+        if scheduler is not None:
+            for _ in range(scheduler.step(len(agent.memory))):
+                with prof.section('train_minibatch'):
+                    loss = agent.train_long_memory(scheduler.batch_size)
 
         if done:
-            # train long memory, plot result
-            game.reset()
+            # train long memory, log result
+            if recorder is not None:
+                recorder.finish(score)
+                game.reset(recorder.start())
+            else:
+                game.reset()
+            agent.n_games += 1
+            if scheduler is None:
+                with prof.section('train_long_memory'):
+                    loss = agent.train_long_memory()
+
+            agent.scores.append(score)
+            agent.total_score += score
+            mean_score = agent.total_score / agent.n_games
+
+            if not quiet:
+                if score > agent.record:
+                    with prof.section('save'):
+                        agent.model.save()
+                print('Game', agent.n_games, 'Score', score, 'Record:', max(agent.record, score))
+            agent.record = max(agent.record, score)
+
+            if checkpoint_every and agent.n_games % checkpoint_every == 0:
+                with prof.section('checkpoint'), agent.memory_lock:
+                    save_checkpoint(agent, checkpoint)
+
+            now = time.perf_counter()
+            if metrics is not None:
+                with prof.section('metrics'):
+                    metrics.log(game=agent.n_games, score=score, mean_score=mean_score, epsilon=agent.epsilon,
+                                loss=loss, steps_per_sec=game_steps / (now - game_start))
+            game_start, game_steps = now, 0
+
+            if prof.enabled:
+                prof.gauge('replay transitions', len(agent.memory))
+                prof.gauge('replay bytes', agent.memory.nbytes)
+                if agent.prefetcher is not None:
+                    prof.gauge('prefetch empty %', round(100 * agent.prefetcher.stats['empty_rate'], 1))
+                last_episode = prof.end_episode()
+                if profile_every and agent.n_games % profile_every == 0:
+                    prof.report(last_episode, profile_file)
+
+            recent_mean = np.mean(agent.scores[-window:])
+            if max_games is not None and agent.n_games >= max_games:
+                break
+            if target_score is not None and len(agent.scores) >= window and recent_mean >= target_score:
+                break
+
+    return {
+        'games': agent.n_games,
+        'steps': agent.n_steps,
+        'updates': agent.trainer.n_updates,
+        'record': agent.record,
+        'mean_score': mean_score,
+        'recent_mean_score': recent_mean,
+    }
+
+
+def train_vec(agent=None, n_envs=16, max_games=None, target_score=None, window=100, quiet=False, metrics=None,
+              checkpoint=CHECKPOINT_PATH, checkpoint_every=0, scheduler=None, short_memory=True, seed=None):
+    # train() over a VecSnakeGame of n_envs headless games: one forward pass picks the
+    # actions of all games, the N transitions of a step go to memory in one push_batch,
+    # the short memory update is one batched step and every finished game counts as in train()
+    from vec_game import VecSnakeGame
+    if agent is None:
+        agent = Agent()
+    if agent.n_step_buffer is not None:
+        raise ValueError('n-step returns are collected per game, use train() with n_step > 1')
+    games = VecSnakeGame(n_envs, seed=seed)
+    states = games.get_states()
+    start, start_steps = time.perf_counter(), agent.n_steps
+    loss = mean_score = recent_mean = None
+    while True:
+        actions = agent.get_actions(states)
+        next_states, rewards, dones = games.step(actions)
+        agent.n_steps += n_envs
+
+        if short_memory:
+            agent.trainer.train_step(states, actions, rewards, next_states, dones, gamma=agent.gamma)
+        # next_states rows of finished games are already the next game's first state,
+        # their targets never bootstrap from it since done is set
+        with agent.memory_lock:
+            agent.memory.push_batch(states, actions, rewards, next_states, dones)
+        states = next_states
+
+        if scheduler is not None:
+            # the cadence counts environment steps, n_envs of them per lockstep
+            for _ in range(sum(scheduler.step(len(agent.memory)) for _ in range(n_envs))):
+                loss = agent.train_long_memory(scheduler.batch_size)
+
+        for score in games.final_scores[dones]:
+            score = int(score)
             agent.n_games += 1
-            agent.train_long_memory()
+            if scheduler is None:
+                loss = agent.train_long_memory()
+            agent.scores.append(score)
+            agent.total_score += score
+            mean_score = agent.total_score / agent.n_games
+
+            if not quiet:
+                if score > agent.record:
+                    agent.model.save()
+                print('Game', agent.n_games, 'Score', score, 'Record:', max(agent.record, score))
+            agent.record = max(agent.record, score)
+
+            if checkpoint_every and agent.n_games % checkpoint_every == 0:
+                with agent.memory_lock:
+                    save_checkpoint(agent, checkpoint)
 
-            if score > record:
-                record = score
-                agent.model.save()
+            if metrics is not None:
+                now = time.perf_counter()
+                metrics.log(game=agent.n_games, score=score, mean_score=mean_score, epsilon=agent.epsilon,
+                            loss=loss, steps_per_sec=(agent.n_steps - start_steps) / (now - start))
 
-            print('Game', agent.n_games, 'Score', score, 'Record:', record)
+        if dones.any():
+            recent_mean = np.mean(agent.scores[-window:])
+            if max_games is not None and agent.n_games >= max_games:
+                break
+            if target_score is not None and len(agent.scores) >= window and recent_mean >= target_score:
+                break
 
-            plot_scores.append(score)
-            total_score += score
-            mean_score = total_score / agent.n_games
-            plot_mean_scores.append(mean_score)
-            plot(plot_scores, plot_mean_scores)
+    return {
+        'games': agent.n_games,
+        'steps': agent.n_steps,
+        'updates': agent.trainer.n_updates,
+        'record': agent.record,
+        'mean_score': mean_score,
+        'recent_mean_score': recent_mean,
+    }
 
 
 if __name__ == '__main__':
-    train()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Train the Snake DQN agent.')
+    parser.add_argument('--render', action='store_true', help='show the game window (throttled to SPEED fps)')
+    parser.add_argument('--per', action='store_true', help='use prioritized experience replay')
+    parser.add_argument('--target-update', type=int, default=0, metavar='N',
+                        help='frozen target network, hard copy every N updates')
+    parser.add_argument('--tau', type=float, default=None, help='Polyak-averaged target network with this rate')
+    parser.add_argument('--double', action='store_true', help='Double DQN targets, needs --target-update or --tau')
+    parser.add_argument('--n-step', type=int, default=1, help='n-step returns')
+    parser.add_argument('--metrics', default='metrics.csv', help='append per-game metrics to this CSV file')
+    parser.add_argument('--plot', action='store_true', help='live plot of the metrics file in a separate process')
+    parser.add_argument('--checkpoint', default=CHECKPOINT_PATH, help='checkpoint directory')
+    parser.add_argument('--checkpoint-every', type=int, default=50, metavar='N',
+                        help='write a full checkpoint every N games (0 disables)')
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoint directory')
+    parser.add_argument('--record', default=None, metavar='PATH',
+                        help='append every game as seed + actions to this log (see recorder.py)')
+    parser.add_argument('--profile', type=int, default=0, metavar='N',
+                        help='print a per-phase timing table every N games')
+    parser.add_argument('--profile-file', default=None, help='append the timing table to this file instead')
+    parser.add_argument('--train-every', type=int, default=0, metavar='K',
+                        help='minibatch updates every K steps instead of one long memory update per game')
+    parser.add_argument('--replay-ratio', type=float, default=0.25, help='gradient steps per environment step')
+    parser.add_argument('--warmup', type=int, default=1000, help='transitions to collect before the first update')
+    parser.add_argument('--minibatch', type=int, default=64, help='minibatch size with --train-every')
+    parser.add_argument('--no-short-memory', action='store_true', help='skip the single-sample update every step')
+    parser.add_argument('--replay-dir', default=None, metavar='DIR',
+                        help='keep the replay memory in memory-mapped files in DIR (continues an existing one)')
+    parser.add_argument('--max-memory', type=int, default=MAX_MEMORY, help='replay memory capacity')
+    parser.add_argument('--prefetch', type=int, default=0, metavar='N',
+                        help='sample minibatches on a background thread, keeping N ready')
+    parser.add_argument('--envs', type=int, default=0, metavar='N',
+                        help='step N headless games in lockstep with batched action selection (see vec_game.py)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='train with this many actor processes and a separate learner (see distributed.py)')
+    args = parser.parse_args()
+    if args.workers > 0:
+        import distributed
+        distributed.train(args.workers)
+    else:
+        agent = Agent(prioritized=args.per, target_update=args.target_update, tau=args.tau,
+                      double=args.double, n_step=args.n_step, max_memory=args.max_memory,
+                      replay_dir=args.replay_dir)
+        if args.resume:
+            load_checkpoint(agent, args.checkpoint)
+            print('Resumed from', args.checkpoint, 'at game', agent.n_games)
+        if args.prefetch:
+            agent.start_prefetch(args.minibatch if args.train_every else None, args.prefetch)
+        metrics = MetricsLogger(args.metrics, live_plot=args.plot)
+        recorder = None
+        if args.record:
+            from recorder import EpisodeRecorder
+            recorder = EpisodeRecorder(args.record)
+        scheduler = UpdateScheduler(args.train_every, args.replay_ratio, args.warmup, args.minibatch) \
+            if args.train_every else None
+        try:
+            if args.envs:
+                train_vec(agent, args.envs, metrics=metrics,
+                          checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every,
+                          scheduler=scheduler, short_memory=not args.no_short_memory)
+            else:
+                train(agent, render=args.render, metrics=metrics,
+                      checkpoint=args.checkpoint, checkpoint_every=args.checkpoint_every,
+                      profiler=Profiler(enabled=args.profile > 0), profile_every=args.profile,
+                      profile_file=args.profile_file, scheduler=scheduler,
+                      short_memory=not args.no_short_memory, recorder=recorder)
+        finally:
+            metrics.close()
+            agent.stop_prefetch()
+            if args.replay_dir:
+                agent.memory.flush()
+            if recorder is not None:
+                recorder.close()
\ No newline at end of file
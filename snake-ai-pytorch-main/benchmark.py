@@ -0,0 +1,60 @@
+import argparse
+import random
+import time
+import numpy as np
+import torch
+from agent import Agent, train
+from scheduler import UpdateScheduler
+
+# name -> Agent keyword arguments, UpdateScheduler keyword arguments (None: one update per game)
+# and whether the single-sample update runs every step
+VARIANTS = {
+    'uniform': {'agent': {}},
+    'per': {'agent': {'prioritized': True}},
+    'scheduled': {'agent': {}, 'scheduler': {'train_every': 4, 'replay_ratio': 0.25}, 'short_memory': False},
+    'target': {'agent': {'target_update': 100}},
+    'polyak': {'agent': {'tau': 0.01}},
+    'double': {'agent': {'target_update': 100, 'double': True}},
+    'nstep': {'agent': {'n_step': 3}},
+    'double-nstep': {'agent': {'target_update': 100, 'double': True, 'n_step': 3}},
+}
+
+
+def seed_everything(seed):
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def run(variant, seed, target_score, window, max_games):
+    seed_everything(seed)
+    config = VARIANTS[variant]
+    agent = Agent(**config['agent'])
+    scheduler = UpdateScheduler(**config['scheduler']) if config.get('scheduler') else None
+    start = time.perf_counter()
+    result = train(agent, max_games=max_games, target_score=target_score, window=window, quiet=True,
+                   scheduler=scheduler, short_memory=config.get('short_memory', True))
+    result['seconds'] = time.perf_counter() - start
+    result['reached'] = result['recent_mean_score'] >= target_score
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to reach a mean score for each training variant.')
+    parser.add_argument('--variants', nargs='+', default=list(VARIANTS), choices=list(VARIANTS))
+    parser.add_argument('--target', type=float, default=5.0, help='mean score over the last --window games')
+    parser.add_argument('--window', type=int, default=50)
+    parser.add_argument('--max-games', type=int, default=1000)
+    parser.add_argument('--seeds', type=int, nargs='+', default=[0, 1, 2])
+    args = parser.parse_args()
+
+    print('variant        seed  reached  games   env steps  grad steps  seconds')
+    for variant in args.variants:
+        for seed in args.seeds:
+            r = run(variant, seed, args.target, args.window, args.max_games)
+            print('{:<14} {:>4}  {:<7}  {:>5}  {:>10}  {:>10}  {:>7.1f}'.format(
+                variant, seed, str(r['reached']), r['games'], r['steps'], r['updates'], r['seconds']))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+import os
+import random
+import shutil
+import numpy as np
+import torch
+
+CHECKPOINT_PATH = os.path.join('model', 'checkpoint')
+STATE_FILE = 'state.pt'
+MEMORY_FILE = 'memory.npz'
+
+
+def save_checkpoint(agent, path=CHECKPOINT_PATH):
+    """
+    Write model, optimizer, agent counters, RNG states and replay memory to the
+    directory `path`. Everything goes into a temporary directory first which is
+    then swapped in, so a crash never leaves a half-written checkpoint.
+    """
+    tmp, old = path + '.tmp', path + '.old'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    # replay memory: the filled rows of each array, written uncompressed in one go
+    arrays, memory_meta = agent.memory.state_dict()
+    np.savez(os.path.join(tmp, MEMORY_FILE), **arrays)
+
+    torch.save({
+        'model': agent.model.state_dict(),
+        'optimizer': agent.trainer.optimizer.state_dict(),
+        'target_model': agent.trainer.target_model.state_dict() if agent.trainer.target_model is not None else None,
+        'n_updates': agent.trainer.n_updates,
+        'n_games': agent.n_games,
+        'n_steps': agent.n_steps,
+        'scores': agent.scores,
+        'total_score': agent.total_score,
+        'record': agent.record,
+        'memory': memory_meta,
+        'rng': {
+            'python': random.getstate(),
+            'numpy': np.random.get_state(),
+            'torch': torch.get_rng_state(),
+        },
+    }, os.path.join(tmp, STATE_FILE))
+
+    if os.path.exists(path):
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(path, old)
+    os.replace(tmp, path)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load_checkpoint(agent, path=CHECKPOINT_PATH):
+    if not os.path.exists(path) and os.path.exists(path + '.old'):
+        # interrupted between the two renames in save_checkpoint
+        path = path + '.old'
+
+    state = torch.load(os.path.join(path, STATE_FILE), weights_only=False)
+    # the replay memory first: it is the part that can fail (e.g. a replay directory that is gone),
+    # and then nothing else of the agent has been touched yet
+    with np.load(os.path.join(path, MEMORY_FILE)) as f:
+        agent.memory.load_state_dict({name: f[name] for name in f.files}, state['memory'])
+    agent.model.load_state_dict(state['model'])
+    agent.trainer.optimizer.load_state_dict(state['optimizer'])
+    if agent.trainer.target_model is not None:
+        agent.trainer.target_model.load_state_dict(state.get('target_model') or state['model'])
+    agent.trainer.n_updates = state['n_updates']
+    agent.n_games = state['n_games']
+    agent.n_steps = state['n_steps']
+    agent.scores = state['scores']
+    agent.total_score = state['total_score']
+    agent.record = state['record']
+
+    random.setstate(state['rng']['python'])
+    np.random.set_state(state['rng']['numpy'])
+    torch.set_rng_state(state['rng']['torch'])
+    return agent
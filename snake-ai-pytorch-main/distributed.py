@@ -0,0 +1,127 @@
+import argparse
+import random
+import time
+import numpy as np
+import torch
+import torch.multiprocessing as mp
+from game import SnakeGameAI
+from model import Linear_QNet, QTrainer
+from memory import SharedReplayBuffer
+from agent import Agent, MAX_MEMORY, BATCH_SIZE, LR, GAMMA
+
+CHUNK = 64 # transitions an actor collects before one locked write into the buffer
+SYNC_EVERY = 50 # learner updates between weight broadcasts
+REPORT_EVERY = 5.0 # seconds
+
+
+def actor_epsilon(i, n, base=0.4, alpha=7):
+    # Ape-X style spread: actor 0 explores most, the last one is almost greedy
+    if n == 1:
+        return base
+    return base ** (1 + alpha * i / (n - 1))
+
+
+def actor(i, epsilon, shared_model, version, memory, stop, steps, games, scores):
+    torch.set_num_threads(1)
+    random.seed(i)
+    model = Linear_QNet(11, 256, 3)
+    model.load_state_dict(shared_model.state_dict())
+    local_version = version.value
+    game = SnakeGameAI()
+    chunk = []
+
+    state = Agent.get_state(game)
+    while not stop.is_set():
+        if version.value != local_version:
+            local_version = version.value
+            model.load_state_dict(shared_model.state_dict())
+
+        if random.random() < epsilon:
+            move = random.randint(0, 2)
+        else:
+            with torch.no_grad():
+                move = torch.argmax(model(torch.from_numpy(state).float())).item()
+
+        reward, done, score = game.play_step(move)
+        next_state = Agent.get_state(game)
+        chunk.append((state, move, reward, next_state, done))
+        steps[i] += 1
+
+        if done:
+            game.reset()
+            next_state = Agent.get_state(game)
+            games[i] += 1
+            scores[i] += score
+        state = next_state
+
+        if len(chunk) == CHUNK:
+            states, moves, rewards, next_states, dones = zip(*chunk)
+            memory.push_batch(np.array(states), np.array(moves), np.array(rewards),
+                              np.array(next_states), np.array(dones))
+            chunk = []
+
+
+def train(workers, duration=None, warmup=BATCH_SIZE):
+    ctx = mp.get_context('spawn')
+    memory = SharedReplayBuffer(MAX_MEMORY, 11, ctx=ctx)
+    model = Linear_QNet(11, 256, 3)
+    trainer = QTrainer(model, lr=LR, gamma=GAMMA)
+    shared_model = Linear_QNet(11, 256, 3)
+    shared_model.load_state_dict(model.state_dict())
+    shared_model.share_memory()
+    version = ctx.Value('i', 0)
+    stop = ctx.Event()
+    steps = ctx.Array('q', workers, lock=False)
+    games = ctx.Array('q', workers, lock=False)
+    scores = ctx.Array('q', workers, lock=False)
+
+    actors = [ctx.Process(target=actor, daemon=True,
+                          args=(i, actor_epsilon(i, workers), shared_model, version, memory,
+                                stop, steps, games, scores))
+              for i in range(workers)]
+    for p in actors:
+        p.start()
+
+    start = last_report = time.time()
+    last_steps = last_updates = last_games = last_scores = 0
+    try:
+        while duration is None or time.time() - start < duration:
+            if len(memory) < warmup:
+                time.sleep(0.01)
+            else:
+                batch = memory.sample(BATCH_SIZE)
+                trainer.train_step(batch.states, batch.actions, batch.rewards, batch.next_states, batch.dones)
+                if trainer.n_updates % SYNC_EVERY == 0:
+                    with torch.no_grad():
+                        for shared, param in zip(shared_model.parameters(), model.parameters()):
+                            shared.copy_(param)
+                    version.value += 1
+
+            now = time.time()
+            if now - last_report >= REPORT_EVERY:
+                total_steps, total_games, total_scores = sum(steps), sum(games), sum(scores)
+                new_games = total_games - last_games
+                mean = (total_scores - last_scores) / new_games if new_games else 0.0
+                print('steps/sec {:.0f}  updates/sec {:.1f}  games {}  mean score {:.2f}  memory {}'.format(
+                    (total_steps - last_steps) / (now - last_report),
+                    (trainer.n_updates - last_updates) / (now - last_report),
+                    total_games, mean, len(memory)))
+                last_report = now
+                last_steps, last_updates, last_games, last_scores = total_steps, trainer.n_updates, total_games, total_scores
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        for p in actors:
+            p.join(timeout=5)
+        model.save()
+
+    return model
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the Snake DQN agent with parallel actors and one learner.')
+    parser.add_argument('--workers', type=int, default=max(1, mp.cpu_count() - 1), help='number of actor processes')
+    parser.add_argument('--duration', type=float, default=None, help='stop after this many seconds')
+    args = parser.parse_args()
+    train(args.workers, args.duration)
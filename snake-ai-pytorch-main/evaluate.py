@@ -0,0 +1,105 @@
+import argparse
+import multiprocessing as mp
+import os
+import sys
+import time
+import numpy as np
+from game import SnakeGameAI, get_state
+from inference import NumpyPolicy
+
+# worker processes only import numpy and the headless game: the policies are
+# handed over as NumPy weights
+
+_policies = None
+
+
+def load_weights(path):
+    # (w1, b1, w2, b2) from a NumPy policy (.npz), a state_dict (.pth) or a checkpoint directory
+    if path.endswith('.npz'):
+        policy = NumpyPolicy.load(path)
+        return policy.w1.T, policy.b1, policy.w2.T, policy.b2
+    import torch
+    if os.path.isdir(path):
+        from checkpoint import STATE_FILE
+        state_dict = torch.load(os.path.join(path, STATE_FILE), weights_only=False)['model']
+    else:
+        state_dict = torch.load(path, map_location='cpu')
+    return tuple(state_dict[k].numpy() for k in ('linear1.weight', 'linear1.bias', 'linear2.weight', 'linear2.bias'))
+
+
+def _init(weights):
+    global _policies
+    _policies = [NumpyPolicy(*w) for w in weights]
+
+
+def play(task):
+    # greedy games for one policy, one seeded game per seed
+    index, seeds = task
+    policy = _policies[index]
+    scores = np.empty(len(seeds), dtype=np.int64)
+    lengths = np.empty(len(seeds), dtype=np.int64)
+    game = SnakeGameAI()
+    for i, seed in enumerate(seeds):
+        game.reset(seed)
+        steps, done = 0, False
+        while not done:
+            _, done, score = game.play_step(policy.act(get_state(game)))
+            steps += 1
+        scores[i] = score
+        lengths[i] = steps
+    return index, scores, lengths
+
+
+def evaluate(paths, games=1000, workers=None, seed=0, chunk=25):
+    """
+    Plays `games` greedy games per model across a process pool. All models play
+    the same seeded games. Returns one result dict per path.
+    """
+    weights = [load_weights(path) for path in paths]
+    seeds = list(range(seed, seed + games))
+    tasks = [(index, seeds[i:i + chunk]) for index in range(len(paths)) for i in range(0, games, chunk)]
+
+    scores = [[] for _ in paths]
+    lengths = [[] for _ in paths]
+    start = time.perf_counter()
+    with mp.get_context('spawn').Pool(workers, initializer=_init, initargs=(weights,)) as pool:
+        for index, s, l in pool.imap_unordered(play, tasks):
+            scores[index].append(s)
+            lengths[index].append(l)
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for path, s, l in zip(paths, scores, lengths):
+        s, l = np.concatenate(s), np.concatenate(l)
+        p10, p50, p90, p99 = np.percentile(s, [10, 50, 90, 99])
+        results.append({
+            'model': path, 'games': len(s), 'mean': s.mean(), 'std': s.std(),
+            'p10': p10, 'p50': p50, 'p90': p90, 'p99': p99, 'max': int(s.max()),
+            'mean_length': l.mean(), 'steps': int(l.sum()),
+        })
+    total_steps = sum(r['steps'] for r in results)
+    return results, total_steps / elapsed, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Greedy evaluation of saved Snake models.')
+    parser.add_argument('models', nargs='*', default=[os.path.join('model', 'model.pth')],
+                        help='.pth state dicts, .npz NumPy policies or checkpoint directories')
+    parser.add_argument('--games', type=int, default=1000, help='games per model')
+    parser.add_argument('--workers', type=int, default=None, help='processes (default: all cores)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game')
+    parser.add_argument('--gate', type=float, default=None,
+                        help='exit with status 1 unless every model reaches this mean score')
+    args = parser.parse_args()
+
+    results, steps_per_sec, elapsed = evaluate(args.models, args.games, args.workers, args.seed)
+    print('{:<30} {:>6} {:>7} {:>6} {:>5} {:>5} {:>5} {:>5} {:>5} {:>8}'.format(
+        'model', 'games', 'mean', 'std', 'p10', 'p50', 'p90', 'p99', 'max', 'length'))
+    for r in results:
+        print('{:<30} {:>6} {:>7.2f} {:>6.2f} {:>5.0f} {:>5.0f} {:>5.0f} {:>5.0f} {:>5} {:>8.1f}'.format(
+            r['model'], r['games'], r['mean'], r['std'], r['p10'], r['p50'], r['p90'], r['p99'],
+            r['max'], r['mean_length']))
+    print('{:.1f}s, {:.0f} steps/sec'.format(elapsed, steps_per_sec))
+
+    if args.gate is not None and any(r['mean'] < args.gate for r in results):
+        sys.exit(1)
@@ -1,12 +1,10 @@
-import pygame
+import os
 import random
 from enum import Enum
-from collections import namedtuple
+from collections import namedtuple, deque
 import numpy as np
 
-pygame.init()
-font = pygame.font.Font('arial.ttf', 25)
-#font = pygame.font.SysFont('arial', 25)
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'arial.ttf')
 
 class Direction(Enum):
     RIGHT = 1
@@ -26,53 +24,210 @@ BLACK = (0,0,0)
 BLOCK_SIZE = 20
 SPEED = 40
 
+# action codes: [straight, right, left]
+STRAIGHT = 0
+RIGHT_TURN = 1
+LEFT_TURN = 2
+
+CLOCK_WISE = [Direction.RIGHT, Direction.DOWN, Direction.LEFT, Direction.UP]
+CLOCK_WISE_INDEX = {d: i for i, d in enumerate(CLOCK_WISE)}
+TURN = (0, 1, -1) # index offset in CLOCK_WISE for each action code
+DELTAS = {
+    Direction.RIGHT: (BLOCK_SIZE, 0),
+    Direction.LEFT: (-BLOCK_SIZE, 0),
+    Direction.DOWN: (0, BLOCK_SIZE),
+    Direction.UP: (0, -BLOCK_SIZE),
+}
+
+
+def action_code(action):
+    # accepts an int code or the one-hot [straight, right, left] list
+    if isinstance(action, (int, np.integer)):
+        return int(action)
+    if isinstance(action, list):
+        return action.index(1)
+    return int(np.argmax(action))
+
+
+def get_state(game):
+    # the 11 features the agent sees; lives here so evaluators can use it without torch
+    head = game.snake[0]
+    point_l = Point(head.x - BLOCK_SIZE, head.y)
+    point_r = Point(head.x + BLOCK_SIZE, head.y)
+    point_u = Point(head.x, head.y - BLOCK_SIZE)
+    point_d = Point(head.x, head.y + BLOCK_SIZE)
+    
+    dir_l = game.direction == Direction.LEFT
+    dir_r = game.direction == Direction.RIGHT
+    dir_u = game.direction == Direction.UP
+    dir_d = game.direction == Direction.DOWN
+
+    state = [
+        # Danger straight
+        (dir_r and game.is_collision(point_r)) or 
+        (dir_l and game.is_collision(point_l)) or 
+        (dir_u and game.is_collision(point_u)) or 
+        (dir_d and game.is_collision(point_d)),
+
+        # Danger right
+        (dir_u and game.is_collision(point_r)) or 
+        (dir_d and game.is_collision(point_l)) or 
+        (dir_l and game.is_collision(point_u)) or 
+        (dir_r and game.is_collision(point_d)),
+
+        # Danger left
+        (dir_d and game.is_collision(point_r)) or 
+        (dir_u and game.is_collision(point_l)) or 
+        (dir_r and game.is_collision(point_u)) or 
+        (dir_l and game.is_collision(point_d)),
+        
+        # Move direction
+        dir_l,
+        dir_r,
+        dir_u,
+        dir_d,
+        
+        # Food location 
+        game.food.x < game.head.x,  # food left
+        game.food.x > game.head.x,  # food right
+        game.food.y < game.head.y,  # food up
+        game.food.y > game.head.y  # food down
+        ]
+
+    return np.array(state, dtype=int)
+
+
+class SnakeRenderer:
+    # pygame viewer, only imported and initialised when rendering is requested
+
+    def __init__(self, w, h, speed=SPEED):
+        import pygame
+        self.pygame = pygame
+        pygame.init()
+        self.font = pygame.font.Font(FONT_PATH, 25)
+        self.display = pygame.display.set_mode((w, h))
+        pygame.display.set_caption('Snake')
+        self.clock = pygame.time.Clock()
+        self.speed = speed
+
+    def pump_events(self):
+        for event in self.pygame.event.get():
+            if event.type == self.pygame.QUIT:
+                self.pygame.quit()
+                quit()
+
+    def draw(self, game):
+        pygame = self.pygame
+        self.display.fill(BLACK)
+
+        for pt in game.snake:
+            pygame.draw.rect(self.display, BLUE1, pygame.Rect(pt.x, pt.y, BLOCK_SIZE, BLOCK_SIZE))
+            pygame.draw.rect(self.display, BLUE2, pygame.Rect(pt.x+4, pt.y+4, 12, 12))
+
+        pygame.draw.rect(self.display, RED, pygame.Rect(game.food.x, game.food.y, BLOCK_SIZE, BLOCK_SIZE))
+
+        text = self.font.render("Score: " + str(game.score), True, WHITE)
+        self.display.blit(text, [0, 0])
+        pygame.display.flip()
+
+    def tick(self):
+        self.clock.tick(self.speed)
+
+
 class SnakeGameAI:
 
-    def __init__(self, w=640, h=480):
+    def __init__(self, w=640, h=480, render=False, seed=None):
         self.w = w
         self.h = h
-        # init display
-        self.display = pygame.display.set_mode((self.w, self.h))
-        pygame.display.set_caption('Snake')
-        self.clock = pygame.time.Clock()
-        self.reset()
+        # food placement draws from the global random module unless the game is seeded
+        self.rng = random
+        self.cols = w // BLOCK_SIZE
+        self.rows = h // BLOCK_SIZE
+        # the display is opt-in, headless games never touch pygame
+        self.renderer = SnakeRenderer(self.w, self.h) if render else None
 
+        self.reset(seed)
 
-    def reset(self):
-        # init game state
-        self.direction = Direction.RIGHT
 
-        self.head = Point(self.w/2, self.h/2)
-        self.snake = [self.head,
-                      Point(self.head.x-BLOCK_SIZE, self.head.y),
-                      Point(self.head.x-(2*BLOCK_SIZE), self.head.y)]
+    def reset(self, seed=None):
+        # a seeded game is fully determined by its seed and the actions played
+        if seed is not None:
+            self.rng = random.Random(seed)
 
-        self.score = 0
-        self.food = None
+        # init game state
+        head = Point((self.cols // 2) * BLOCK_SIZE, (self.rows // 2) * BLOCK_SIZE)
+        self.set_state([head, Point(head.x-BLOCK_SIZE, head.y), Point(head.x-(2*BLOCK_SIZE), head.y)],
+                       Direction.RIGHT, None, 0, 0)
         self._place_food()
-        self.frame_iteration = 0
+
+
+    def set_state(self, snake, direction, food, score, frame_iteration):
+        # puts the game into the given position, e.g. one restored from a planning.SnakeState
+        # occupancy count of every cell and an index of the free ones:
+        # _free lists the free cells, _free_pos[cell] is the cell's slot in _free.
+        # Rebuilt in cell order every time so food placement only depends on
+        # the seed and the actions, not on the previous game or position
+        n_cells = self.cols * self.rows
+        self._grid = bytearray(n_cells)
+        self._free = list(range(n_cells))
+        self._free_pos = list(range(n_cells))
+
+        self.snake = deque(snake)
+        self.head = self.snake[0]
+        for pt in self.snake:
+            self._occupy(pt)
+        self.direction = direction
+        self.food = food
+        self.score = score
+        self.frame_iteration = frame_iteration
+
+
+    def _cell(self, pt):
+        return int(pt.y) // BLOCK_SIZE * self.cols + int(pt.x) // BLOCK_SIZE
+
+
+    def _in_bounds(self, pt):
+        return 0 <= pt.x <= self.w - BLOCK_SIZE and 0 <= pt.y <= self.h - BLOCK_SIZE
+
+
+    def _occupy(self, pt):
+        cell = self._cell(pt)
+        if self._grid[cell] == 0:
+            # swap-remove the cell from the free index
+            i = self._free_pos[cell]
+            last = self._free[-1]
+            self._free[i] = last
+            self._free_pos[last] = i
+            self._free.pop()
+        self._grid[cell] += 1
+
+
+    def _vacate(self, pt):
+        cell = self._cell(pt)
+        self._grid[cell] -= 1
+        if self._grid[cell] == 0:
+            self._free_pos[cell] = len(self._free)
+            self._free.append(cell)
 
 
     def _place_food(self):
-        x = random.randint(0, (self.w-BLOCK_SIZE )//BLOCK_SIZE )*BLOCK_SIZE
-        y = random.randint(0, (self.h-BLOCK_SIZE )//BLOCK_SIZE )*BLOCK_SIZE
-        self.food = Point(x, y)
-        if self.food in self.snake:
-            self._place_food()
+        # uniform over the free cells, no retries however long the snake is
+        cell = self._free[self.rng.randrange(len(self._free))]
+        self.food = Point((cell % self.cols) * BLOCK_SIZE, (cell // self.cols) * BLOCK_SIZE)
 
 
     def play_step(self, action):
         self.frame_iteration += 1
         # 1. collect user input
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                quit()
-        
+        if self.renderer is not None:
+            self.renderer.pump_events()
+
         # 2. move
         self._move(action) # update the head
-        self.snake.insert(0, self.head)
-        
+        self.snake.appendleft(self.head)
+        if self._in_bounds(self.head):
+            self._occupy(self.head)
+
         # 3. check if game over
         reward = 0
         game_over = False
@@ -87,11 +242,12 @@ class SnakeGameAI:
             reward = 10
             self._place_food()
         else:
-            self.snake.pop()
-        
+            self._vacate(self.snake.pop())
+
         # 5. update ui and clock
-        self._update_ui()
-        self.clock.tick(SPEED)
+        if self.renderer is not None:
+            self._update_ui()
+            self.renderer.tick()
         # 6. return game over and score
         return reward, game_over, self.score
 
@@ -100,55 +256,23 @@ class SnakeGameAI:
         if pt is None:
             pt = self.head
         # hits boundary
-        if pt.x > self.w - BLOCK_SIZE or pt.x < 0 or pt.y > self.h - BLOCK_SIZE or pt.y < 0:
+        if not self._in_bounds(pt):
             return True
-        # hits itself
-        if pt in self.snake[1:]:
-            return True
-
-        return False
+        # hits itself: the head's own entry does not count, as with snake[1:]
+        count = self._grid[self._cell(pt)]
+        if pt == self.head:
+            count -= 1
+        return count > 0
 
 
     def _update_ui(self):
-        self.display.fill(BLACK)
-
-        for pt in self.snake:
-            pygame.draw.rect(self.display, BLUE1, pygame.Rect(pt.x, pt.y, BLOCK_SIZE, BLOCK_SIZE))
-            pygame.draw.rect(self.display, BLUE2, pygame.Rect(pt.x+4, pt.y+4, 12, 12))
-
-        pygame.draw.rect(self.display, RED, pygame.Rect(self.food.x, self.food.y, BLOCK_SIZE, BLOCK_SIZE))
-
-        text = font.render("Score: " + str(self.score), True, WHITE)
-        self.display.blit(text, [0, 0])
-        pygame.display.flip()
+        self.renderer.draw(self)
 
 
     def _move(self, action):
-        # [straight, right, left]
-
-        clock_wise = [Direction.RIGHT, Direction.DOWN, Direction.LEFT, Direction.UP]
-        idx = clock_wise.index(self.direction)
-
-        if np.array_equal(action, [1, 0, 0]):
-            new_dir = clock_wise[idx] # no change
-        elif np.array_equal(action, [0, 1, 0]):
-            next_idx = (idx + 1) % 4
-            new_dir = clock_wise[next_idx] # right turn r -> d -> l -> u
-        else: # [0, 0, 1]
-            next_idx = (idx - 1) % 4
-            new_dir = clock_wise[next_idx] # left turn r -> u -> l -> d
-
-        self.direction = new_dir
-
-        x = self.head.x
-        y = self.head.y
-        if self.direction == Direction.RIGHT:
-            x += BLOCK_SIZE
-        elif self.direction == Direction.LEFT:
-            x -= BLOCK_SIZE
-        elif self.direction == Direction.DOWN:
-            y += BLOCK_SIZE
-        elif self.direction == Direction.UP:
-            y -= BLOCK_SIZE
-
-        self.head = Point(x, y)
\ No newline at end of file
+        # action: code from [straight, right, left] or the matching one-hot list
+        idx = (CLOCK_WISE_INDEX[self.direction] + TURN[action_code(action)]) % 4
+        self.direction = CLOCK_WISE[idx]
+
+        dx, dy = DELTAS[self.direction]
+        self.head = Point(self.head.x + dx, self.head.y + dy)
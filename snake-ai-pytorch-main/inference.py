@@ -0,0 +1,142 @@
+import argparse
+import os
+import time
+import numpy as np
+
+# torch is only imported by the functions that need it, so evaluators that
+# act through NumpyPolicy only pay for a numpy import
+
+MODEL_PATH = os.path.join('model', 'model.pth')
+
+
+class NumpyPolicy:
+    """
+    Pure NumPy forward pass of Linear_QNet (linear -> relu -> linear),
+    greedy actions for one state or a batch of states.
+    """
+
+    def __init__(self, w1, b1, w2, b2):
+        # weights as stored by nn.Linear: (out, in)
+        self.w1 = np.ascontiguousarray(np.asarray(w1, dtype=np.float32).T)
+        self.b1 = np.asarray(b1, dtype=np.float32)
+        self.w2 = np.ascontiguousarray(np.asarray(w2, dtype=np.float32).T)
+        self.b2 = np.asarray(b2, dtype=np.float32)
+
+    @classmethod
+    def from_state_dict(cls, state_dict):
+        return cls(*(np.asarray(state_dict[k]) for k in ('linear1.weight', 'linear1.bias',
+                                                         'linear2.weight', 'linear2.bias')))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as f:
+            return cls(f['w1'], f['b1'], f['w2'], f['b2'])
+
+    def save(self, path):
+        np.savez(path, w1=self.w1.T, b1=self.b1, w2=self.w2.T, b2=self.b2)
+
+    def q_values(self, states):
+        hidden = np.asarray(states, dtype=np.float32) @ self.w1
+        hidden += self.b1
+        np.maximum(hidden, 0, out=hidden)
+        return hidden @ self.w2 + self.b2
+
+    def act(self, state):
+        return int(np.argmax(self.q_values(state)))
+
+    def act_batch(self, states):
+        return np.argmax(self.q_values(states), axis=1)
+
+
+class TorchPolicy:
+    """
+    Greedy actions from a Linear_QNet or TorchScript module under inference_mode.
+    """
+
+    def __init__(self, model):
+        import torch
+        self.torch = torch
+        self.model = model.eval()
+
+    @classmethod
+    def load(cls, path):
+        import torch
+        return cls(torch.jit.load(path))
+
+    def q_values(self, states):
+        torch = self.torch
+        x = torch.as_tensor(np.asarray(states), dtype=torch.float)
+        single = x.dim() == 1
+        with torch.inference_mode():
+            # quantized and traced modules only take (n, x) input
+            q = self.model(x.unsqueeze(0) if single else x).numpy()
+        return q[0] if single else q
+
+    def act(self, state):
+        return int(np.argmax(self.q_values(state)))
+
+    def act_batch(self, states):
+        return np.argmax(self.q_values(states), axis=1)
+
+
+def load_model(path=MODEL_PATH, input_size=11, hidden_size=256, output_size=3):
+    import torch
+    from model import Linear_QNet
+    model = Linear_QNet(input_size, hidden_size, output_size)
+    model.load_state_dict(torch.load(path, map_location='cpu'))
+    return model.eval()
+
+
+def export_numpy(model_path=MODEL_PATH, out_path=os.path.join('model', 'policy.npz')):
+    import torch
+    state_dict = {k: v.numpy() for k, v in torch.load(model_path, map_location='cpu').items()}
+    NumpyPolicy.from_state_dict(state_dict).save(out_path)
+    return out_path
+
+
+def export_torchscript(model_path=MODEL_PATH, out_path=os.path.join('model', 'policy.pt'), quantize=False):
+    import torch
+    model = load_model(model_path)
+    if quantize:
+        # int8 weights for the linear layers, activations quantized on the fly
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    scripted = torch.jit.trace(model, torch.zeros(1, model.linear1.in_features))
+    scripted.save(out_path)
+    return out_path
+
+
+def bench(policy, n=100_000, batch_size=1024, state_size=11):
+    states = np.random.randint(0, 2, (n, state_size))
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        policy.act_batch(states[i:i + batch_size])
+    batched = n / (time.perf_counter() - start)
+
+    single = min(n, 10_000)
+    start = time.perf_counter()
+    for i in range(single):
+        policy.act(states[i])
+    one_by_one = single / (time.perf_counter() - start)
+    return batched, one_by_one
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export a trained Linear_QNet for fast CPU inference.')
+    parser.add_argument('--model', default=MODEL_PATH)
+    parser.add_argument('--numpy', metavar='PATH', help='write a NumPy policy (.npz)')
+    parser.add_argument('--torchscript', metavar='PATH', help='write a TorchScript policy (.pt)')
+    parser.add_argument('--quantize', action='store_true', help='dynamic int8 quantization for --torchscript')
+    parser.add_argument('--bench', action='store_true', help='report decisions/sec of the exported policies')
+    args = parser.parse_args()
+
+    policies = {'torch': TorchPolicy(load_model(args.model))}
+    if args.numpy:
+        policies['numpy'] = NumpyPolicy.load(export_numpy(args.model, args.numpy))
+    if args.torchscript:
+        policies['torchscript'] = TorchPolicy.load(export_torchscript(args.model, args.torchscript, args.quantize))
+
+    if args.bench:
+        for name, policy in policies.items():
+            batched, one_by_one = bench(policy)
+            print('{:<12} batched {:>10.0f} decisions/sec  single {:>8.0f} decisions/sec'.format(
+                name, batched, one_by_one))
@@ -0,0 +1,541 @@
+import json
+import multiprocessing as mp
+import os
+import numpy as np
+import torch
+from collections import namedtuple, deque
+
+# weights are importance-sampling weights (None for uniform sampling),
+# indices are the buffer rows the batch was drawn from
+Batch = namedtuple('Batch', 'states, actions, rewards, next_states, dones, weights, indices',
+                   defaults=(None, None))
+
+
+class NStepBuffer:
+    """
+    Turns 1-step transitions into n-step ones: (s_t, a_t, r_t + g r_t+1 + ... + g^(n-1) r_t+n-1, s_t+n, done).
+    At the end of a game the remaining shorter returns are flushed as terminal transitions.
+    """
+
+    def __init__(self, n, gamma):
+        self.n = n
+        self.gamma = gamma
+        self.pending = deque()
+
+    def _emit(self, next_state, done):
+        state, action = self.pending[0][:2]
+        ret = 0.0
+        for i, (_, _, reward) in enumerate(self.pending):
+            ret += self.gamma ** i * reward
+        self.pending.popleft()
+        return state, action, ret, next_state, done
+
+    def push(self, state, action, reward, next_state, done):
+        # returns the transitions that are complete after this step
+        self.pending.append((state, action, reward))
+        if done:
+            return [self._emit(next_state, True) for _ in range(len(self.pending))]
+        if len(self.pending) == self.n:
+            return [self._emit(next_state, False)]
+        return []
+
+
+class ReplayBuffer:
+    """
+    Fixed capacity ring buffer of transitions in preallocated arrays.
+    States are 0/1 feature vectors and are stored bit-packed, actions are
+    stored as int codes.
+    """
+
+    FIELDS = ('states', 'next_states', 'actions', 'rewards', 'dones')
+
+    def __init__(self, capacity, state_size=11, seed=None):
+        self.capacity = capacity
+        self.state_size = state_size
+        self.packed_size = (state_size + 7) // 8
+        self.rng = np.random.default_rng(seed)
+
+        self.states = self._allocate('states', (capacity, self.packed_size), np.uint8)
+        self.next_states = self._allocate('next_states', (capacity, self.packed_size), np.uint8)
+        self.actions = self._allocate('actions', (capacity,), np.uint8)
+        self.rewards = self._allocate('rewards', (capacity,), np.float32)
+        self.dones = self._allocate('dones', (capacity,), np.bool_)
+
+        self.pos = 0
+        self.size = 0
+
+    def _allocate(self, name, shape, dtype):
+        return np.zeros(shape, dtype=dtype)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def nbytes(self):
+        return (self.states.nbytes + self.next_states.nbytes + self.actions.nbytes
+                + self.rewards.nbytes + self.dones.nbytes)
+
+    def push(self, state, action, reward, next_state, done):
+        i = self.pos
+        self.states[i] = np.packbits(state)
+        self.next_states[i] = np.packbits(next_state)
+        self.actions[i] = action
+        self.rewards[i] = reward
+        self.dones[i] = done
+        self.pos = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def push_batch(self, states, actions, rewards, next_states, dones):
+        n = len(actions)
+        idx = (self.pos + np.arange(n)) % self.capacity
+        self.states[idx] = np.packbits(states, axis=1)
+        self.next_states[idx] = np.packbits(next_states, axis=1)
+        self.actions[idx] = actions
+        self.rewards[idx] = rewards
+        self.dones[idx] = dones
+        self.pos = (self.pos + n) % self.capacity
+        self.size = min(self.size + n, self.capacity)
+
+    def sample_indices(self, batch_size):
+        # the whole memory while it is smaller than a batch, as with random.sample on the deque
+        if self.size <= batch_size:
+            return np.arange(self.size)
+        return self.rng.integers(0, self.size, batch_size)
+
+    def _unpack(self, packed):
+        return torch.from_numpy(np.unpackbits(packed, axis=1, count=self.state_size)).float()
+
+    def get(self, idx):
+        return Batch(
+            self._unpack(self.states[idx]),
+            torch.from_numpy(self.actions[idx].astype(np.int64)),
+            torch.from_numpy(self.rewards[idx]),
+            self._unpack(self.next_states[idx]),
+            torch.from_numpy(self.dones[idx].astype(np.float32)),
+            indices=idx,
+        )
+
+    def sample(self, batch_size):
+        return self.get(self.sample_indices(batch_size))
+
+    def update_priorities(self, indices, td_errors):
+        # uniform sampling ignores priorities
+        pass
+
+    def state_dict(self):
+        # (arrays, meta): the filled rows as contiguous arrays for one bulk write,
+        # and the small picklable bookkeeping
+        arrays = {name: getattr(self, name)[:self.size] for name in self.FIELDS}
+        meta = {'capacity': self.capacity, 'pos': self.pos, 'size': self.size,
+                'rng': self.rng.bit_generator.state}
+        return arrays, meta
+
+    def load_state_dict(self, arrays, meta):
+        size = meta['size']
+        if size > self.capacity:
+            raise ValueError('checkpoint holds {} transitions, capacity is {}'.format(size, self.capacity))
+        if not arrays and 'directory' in meta:
+            # checkpoint of a MmapReplayBuffer, its rows are in the replay directory
+            arrays = MmapReplayBuffer.open_rows(meta['directory'], size, self.state_size)
+        for name in self.FIELDS:
+            getattr(self, name)[:size] = arrays[name]
+        self.size = size
+        self.pos = meta['pos'] % self.capacity if meta['capacity'] == self.capacity else size % self.capacity
+        self.rng.bit_generator.state = meta['rng']
+
+
+class SharedReplayBuffer(ReplayBuffer):
+    """
+    ReplayBuffer whose arrays and write position live in multiprocessing shared
+    memory, so actor processes can write into it while a learner samples.
+    Writers take the lock, push_batch keeps it to one acquire per chunk;
+    sample takes it too so no row is copied while an actor overwrites it.
+    """
+
+    def __init__(self, capacity, state_size=11, seed=None, ctx=None):
+        # ctx: the multiprocessing context the worker processes are started from
+        self._ctx = ctx or mp.get_context()
+        self._raw = {}
+        self._pos = self._ctx.RawValue('q', 0)
+        self._size = self._ctx.RawValue('q', 0)
+        self.lock = self._ctx.Lock()
+        super().__init__(capacity, state_size, seed)
+
+    def _allocate(self, name, shape, dtype):
+        raw = self._ctx.RawArray('B', int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        self._raw[name] = (raw, shape, dtype)
+        return np.frombuffer(raw, dtype=dtype).reshape(shape)
+
+    def __getstate__(self):
+        # the numpy views are rebuilt from the shared blocks in the child process
+        state = self.__dict__.copy()
+        del state['_ctx']
+        for name in self.FIELDS:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        for name, (raw, shape, dtype) in self._raw.items():
+            setattr(self, name, np.frombuffer(raw, dtype=dtype).reshape(shape))
+
+    @property
+    def pos(self):
+        return self._pos.value
+
+    @pos.setter
+    def pos(self, value):
+        self._pos.value = value
+
+    @property
+    def size(self):
+        return self._size.value
+
+    @size.setter
+    def size(self, value):
+        self._size.value = value
+
+    def push(self, state, action, reward, next_state, done):
+        with self.lock:
+            super().push(state, action, reward, next_state, done)
+
+    def push_batch(self, states, actions, rewards, next_states, dones):
+        with self.lock:
+            super().push_batch(states, actions, rewards, next_states, dones)
+
+    def sample(self, batch_size):
+        with self.lock:
+            return super().sample(batch_size)
+
+
+class SegmentedArray:
+    """
+    Array of `n_rows` rows stored in memory-mapped .npy segment files of
+    `segment_size` rows each. Segments are created on first write and opened
+    on first access; indexing takes an int, a slice or an array of row indices
+    and only touches the pages of the rows it needs.
+    """
+
+    def __init__(self, directory, name, n_rows, row_shape, dtype, segment_size, readonly=False):
+        self.directory = directory
+        self.name = name
+        self.n_rows = n_rows
+        self.row_shape = tuple(row_shape)
+        self.dtype = np.dtype(dtype)
+        self.segment_size = segment_size
+        self.readonly = readonly
+        self.segments = {}
+
+    @property
+    def shape(self):
+        return (self.n_rows,) + self.row_shape
+
+    @property
+    def nbytes(self):
+        return self.n_rows * int(np.prod(self.row_shape, dtype=np.int64)) * self.dtype.itemsize
+
+    def __len__(self):
+        return self.n_rows
+
+    def _path(self, k):
+        return os.path.join(self.directory, '{}-{:05d}.npy'.format(self.name, k))
+
+    def segment(self, k):
+        seg = self.segments.get(k)
+        if seg is None:
+            path = self._path(k)
+            if os.path.exists(path):
+                seg = np.load(path, mmap_mode='r' if self.readonly else 'r+')
+            else:
+                rows = min(self.segment_size, self.n_rows - k * self.segment_size)
+                seg = np.lib.format.open_memmap(path, mode='w+', dtype=self.dtype, shape=(rows,) + self.row_shape)
+            self.segments[k] = seg
+        return seg
+
+    def _ranges(self, start, stop):
+        # (segment, first row in it, first row in segment, last row in segment) covering [start, stop)
+        while start < stop:
+            k, offset = divmod(start, self.segment_size)
+            n = min(stop - start, self.segment_size - offset)
+            yield k, start, offset, offset + n
+            start += n
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.n_rows)
+            if step != 1:
+                return self[np.arange(start, stop, step)]
+            if start >= stop:
+                return np.empty((0,) + self.row_shape, dtype=self.dtype)
+            return np.concatenate([self.segment(k)[lo:hi] for k, _, lo, hi in self._ranges(start, stop)])
+        idx = np.asarray(key)
+        if idx.ndim == 0:
+            k, offset = divmod(int(idx), self.segment_size)
+            return self.segment(k)[offset]
+        out = np.empty(idx.shape + self.row_shape, dtype=self.dtype)
+        seg = idx // self.segment_size
+        for k in np.unique(seg):
+            mask = seg == k
+            out[mask] = self.segment(int(k))[idx[mask] - k * self.segment_size]
+        return out
+
+    def __setitem__(self, key, value):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self.n_rows)
+            if step != 1:
+                self[np.arange(start, stop, step)] = value
+                return
+            value = np.broadcast_to(np.asarray(value, dtype=self.dtype), (stop - start,) + self.row_shape)
+            for k, first, lo, hi in self._ranges(start, stop):
+                self.segment(k)[lo:hi] = value[first - start:first - start + hi - lo]
+            return
+        idx = np.asarray(key)
+        if idx.ndim == 0:
+            k, offset = divmod(int(idx), self.segment_size)
+            self.segment(k)[offset] = value
+            return
+        value = np.broadcast_to(np.asarray(value, dtype=self.dtype), idx.shape + self.row_shape)
+        seg = idx // self.segment_size
+        for k in np.unique(seg):
+            mask = seg == k
+            self.segment(int(k))[idx[mask] - k * self.segment_size] = value[mask]
+
+    def flush(self):
+        if not self.readonly:
+            for seg in self.segments.values():
+                seg.flush()
+
+
+class MmapReplayBuffer(ReplayBuffer):
+    """
+    ReplayBuffer kept in memory-mapped segment files under `directory`, so it
+    can outgrow RAM (the OS keeps recently written rows in the page cache),
+    survives restarts and can be opened read-only by other processes.
+
+    The write position and fill level go to a small meta file every
+    `flush_every` transitions and on flush(); a buffer opened on an existing
+    directory continues from there. Read-only buffers pick up new rows from
+    the meta file before sampling.
+    """
+
+    META_FILE = 'meta.json'
+
+    def __init__(self, capacity=None, state_size=11, seed=None, directory='replay',
+                 segment_size=1 << 18, readonly=False, flush_every=1000):
+        self.directory = directory
+        self.readonly = readonly
+        self.flush_every = flush_every
+        self._unflushed = 0
+        meta = self._read_meta()
+        if meta is None:
+            if readonly:
+                raise FileNotFoundError('no replay buffer in {}'.format(directory))
+            if capacity is None:
+                raise ValueError('capacity is required for a new replay buffer')
+            os.makedirs(directory, exist_ok=True)
+        else:
+            if capacity is None:
+                capacity = meta['capacity']
+            if (meta['capacity'], meta['state_size']) != (capacity, state_size):
+                raise ValueError('{} holds a buffer of capacity {} and state size {}'.format(
+                    directory, meta['capacity'], meta['state_size']))
+            segment_size = meta['segment_size']
+        self.segment_size = segment_size
+        super().__init__(capacity, state_size, seed)
+        if meta is not None:
+            self.pos, self.size = meta['pos'], meta['size']
+        else:
+            self._write_meta()
+
+    def _allocate(self, name, shape, dtype):
+        return SegmentedArray(self.directory, name, shape[0], shape[1:], dtype, self.segment_size, self.readonly)
+
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.directory, self.META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self):
+        path = os.path.join(self.directory, self.META_FILE)
+        with open(path + '.tmp', 'w') as f:
+            json.dump({'capacity': self.capacity, 'state_size': self.state_size,
+                       'segment_size': self.segment_size, 'pos': self.pos, 'size': self.size}, f)
+        os.replace(path + '.tmp', path)
+
+    def _pushed(self, n):
+        self._unflushed += n
+        if self._unflushed >= self.flush_every:
+            self._write_meta()
+            self._unflushed = 0
+
+    def push(self, state, action, reward, next_state, done):
+        super().push(state, action, reward, next_state, done)
+        self._pushed(1)
+
+    def push_batch(self, states, actions, rewards, next_states, dones):
+        super().push_batch(states, actions, rewards, next_states, dones)
+        self._pushed(len(actions))
+
+    def refresh(self):
+        # read-only buffers: see the rows written by the owning process up to its last meta write
+        meta = self._read_meta()
+        self.pos, self.size = meta['pos'], meta['size']
+
+    def sample_indices(self, batch_size):
+        if self.readonly:
+            self.refresh()
+        return super().sample_indices(batch_size)
+
+    def flush(self):
+        for name in self.FIELDS:
+            getattr(self, name).flush()
+        if not self.readonly:
+            self._write_meta()
+            self._unflushed = 0
+
+    @classmethod
+    def open_rows(cls, directory, size, state_size=11):
+        # the first `size` rows of the buffer in `directory`, for loading its checkpoint into another buffer
+        try:
+            buffer = cls(state_size=state_size, directory=directory, readonly=True)
+        except FileNotFoundError:
+            raise ValueError('the checkpoint keeps its replay memory in {}, which is missing '
+                             '(resume with --replay-dir {})'.format(directory, directory)) from None
+        if size > buffer.capacity:
+            raise ValueError('{} has room for {} transitions, the checkpoint expects {}'.format(
+                directory, buffer.capacity, size))
+        return {name: getattr(buffer, name)[:size] for name in cls.FIELDS}
+
+    def state_dict(self):
+        # the transitions are already on disk, a checkpoint only records where the buffer stands
+        self.flush()
+        meta = {'capacity': self.capacity, 'pos': self.pos, 'size': self.size,
+                'rng': self.rng.bit_generator.state, 'directory': self.directory}
+        return {}, meta
+
+    def load_state_dict(self, arrays, meta):
+        same_directory = 'directory' in meta and os.path.abspath(meta['directory']) == os.path.abspath(self.directory)
+        if not same_directory:
+            # checkpoint of an in-memory buffer or of another replay directory: copy its rows into the files
+            super().load_state_dict(arrays, meta)
+        else:
+            self.size = min(meta['size'], self.capacity)
+            self.pos = meta['pos'] % self.capacity
+            self.rng.bit_generator.state = meta['rng']
+        if not self.readonly:
+            self._write_meta()
+
+
+class SumTree:
+    """
+    Binary sum tree over a flat array: leaves hold priorities, every inner
+    node the sum of its children, tree[1] is the total.
+    """
+
+    def __init__(self, capacity):
+        self.leaf = 1
+        while self.leaf < capacity:
+            self.leaf *= 2
+        self.tree = np.zeros(2 * self.leaf, dtype=np.float64)
+
+    @property
+    def total(self):
+        return self.tree[1]
+
+    def get(self, idx):
+        return self.tree[np.asarray(idx) + self.leaf]
+
+    def update_one(self, i, priority):
+        tree = self.tree
+        i += self.leaf
+        tree[i] = priority
+        i //= 2
+        while i >= 1:
+            tree[i] = tree[2 * i] + tree[2 * i + 1]
+            i //= 2
+
+    def update(self, idx, priorities):
+        idx = np.asarray(idx) + self.leaf
+        self.tree[idx] = priorities
+        # recompute the parents level by level, O(log n) per index
+        idx = np.unique(idx // 2)
+        while True:
+            self.tree[idx] = self.tree[2 * idx] + self.tree[2 * idx + 1]
+            if idx[0] == 1:
+                break
+            idx = np.unique(idx // 2)
+
+    def find(self, values):
+        # leaf index for each prefix sum value, walking all values down together
+        idx = np.ones(len(values), dtype=np.int64)
+        while idx[0] < self.leaf:
+            left = 2 * idx
+            left_sum = self.tree[left]
+            go_right = values > left_sum
+            values = values - left_sum * go_right
+            idx = left + go_right
+        return idx - self.leaf
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    Proportional prioritized replay: P(i) ~ p_i ** alpha with p_i = |td_error| + eps.
+    New transitions get the max priority seen so far, beta is annealed towards 1.
+    """
+
+    def __init__(self, capacity, state_size=11, alpha=0.6, beta=0.4, beta_increment=1e-4, eps=1e-3, seed=None):
+        super().__init__(capacity, state_size, seed)
+        self.alpha = alpha
+        self.beta = beta
+        self.beta_increment = beta_increment
+        self.eps = eps
+        self.max_priority = 1.0
+        self.tree = SumTree(capacity)
+
+    def push(self, state, action, reward, next_state, done):
+        i = self.pos
+        super().push(state, action, reward, next_state, done)
+        self.tree.update_one(i, self.max_priority ** self.alpha)
+
+    def push_batch(self, states, actions, rewards, next_states, dones):
+        idx = (self.pos + np.arange(len(actions))) % self.capacity
+        super().push_batch(states, actions, rewards, next_states, dones)
+        self.tree.update(idx, self.max_priority ** self.alpha)
+
+    def sample(self, batch_size):
+        # stratified: one value from each of batch_size equal slices of the total
+        segment = self.tree.total / batch_size
+        values = (np.arange(batch_size) + self.rng.random(batch_size)) * segment
+        idx = np.minimum(self.tree.find(values), self.size - 1)
+
+        probs = self.tree.get(idx) / self.tree.total
+        weights = (self.size * probs) ** -self.beta
+        weights /= weights.max()
+        self.beta = min(1.0, self.beta + self.beta_increment)
+
+        return self.get(idx)._replace(weights=torch.from_numpy(weights.astype(np.float32)))
+
+    def update_priorities(self, indices, td_errors):
+        priorities = np.abs(td_errors) + self.eps
+        self.max_priority = max(self.max_priority, priorities.max())
+        self.tree.update(indices, priorities ** self.alpha)
+
+    def state_dict(self):
+        arrays, meta = super().state_dict()
+        arrays['priorities'] = self.tree.get(np.arange(self.size))
+        meta.update(beta=self.beta, max_priority=self.max_priority)
+        return arrays, meta
+
+    def load_state_dict(self, arrays, meta):
+        super().load_state_dict(arrays, meta)
+        self.beta = meta.get('beta', self.beta)
+        self.max_priority = meta.get('max_priority', self.max_priority)
+        if 'priorities' in arrays:
+            priorities = arrays['priorities']
+        else:
+            # checkpoint of a uniform buffer
+            priorities = np.full(self.size, self.max_priority ** self.alpha)
+        if self.size:
+            self.tree.update(np.arange(self.size), priorities)
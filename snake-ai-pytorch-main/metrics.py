@@ -0,0 +1,93 @@
+import csv
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+
+FIELDS = ('game', 'score', 'mean_score', 'epsilon', 'loss', 'steps_per_sec')
+
+
+class MetricsLogger:
+    """
+    Per-episode metrics pushed from the training loop into a queue. A background
+    thread appends them to a CSV file in batches, an optional separate process
+    redraws a live plot from that file at its own refresh rate.
+    """
+
+    def __init__(self, path='metrics.csv', flush_interval=1.0, live_plot=False, refresh=2.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._stop = threading.Event()
+
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='')
+        self._writer = csv.writer(self._file)
+        if new_file:
+            self._writer.writerow(FIELDS)
+            self._file.flush()
+        # where this run's rows start, the live plot skips earlier runs appended to the same file
+        self._start = os.path.getsize(path)
+
+        self._thread = threading.Thread(target=self._run, name='metrics-writer', daemon=True)
+        self._thread.start()
+
+        self._plotter = None
+        if live_plot:
+            self._plotter = mp.get_context('spawn').Process(target=plot_file, args=(path, refresh, self._start),
+                                                         daemon=True)
+            self._plotter.start()
+
+    def log(self, **row):
+        # non-blocking, the training loop never waits on I/O
+        self._queue.put(tuple('' if row.get(field) is None else row[field] for field in FIELDS))
+
+    def _drain(self):
+        rows = []
+        while True:
+            try:
+                rows.append(self._queue.get_nowait())
+            except queue.Empty:
+                return rows
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self._write(self._drain())
+        self._write(self._drain())
+
+    def _write(self, rows):
+        if rows:
+            self._writer.writerows(rows)
+            self._file.flush()
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self._file.close()
+        if self._plotter is not None:
+            self._plotter.terminate()
+
+
+def plot_file(path, refresh=2.0, start=0):
+    # runs in its own process: read the rows appended since the last refresh (from byte offset
+    # `start` on) and redraw at most every `refresh` seconds
+    import helper
+    scores, mean_scores = [], []
+    pos = start
+    while True:
+        with open(path, 'rb') as f:
+            f.seek(pos)
+            data = f.read()
+        # the writer thread may be halfway through the last row, leave it for the next refresh
+        data = data[:data.rfind(b'\n') + 1]
+        pos += len(data)
+        for row in csv.reader(data.decode().splitlines()):
+            if len(row) != len(FIELDS) or row[0] == FIELDS[0]:
+                continue
+            scores.append(int(row[1]))
+            mean_scores.append(float(row[2]))
+        if scores:
+            helper.plot(scores, mean_scores, pause=refresh)
+        else:
+            time.sleep(refresh)
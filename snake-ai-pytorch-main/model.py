@@ -3,6 +3,7 @@ import torch.nn as nn
 import torch.optim as optim
 import torch.nn.functional as F
 import os
+import copy
 
 class Linear_QNet(nn.Module):
     def __init__(self, input_size, hidden_size, output_size):
@@ -25,19 +26,51 @@ class Linear_QNet(nn.Module):
 
 
 class QTrainer:
-    def __init__(self, model, lr, gamma):
+    def __init__(self, model, lr, gamma, target_update=0, tau=None, double=False, n_step=1):
+        # target_update: copy the model into a frozen target network every N updates,
+        # tau: Polyak-average the target network towards the model after every update instead,
+        # double: pick next actions with the model and evaluate them with the target network,
+        # n_step: rewards in memory are n-step returns, bootstrap with gamma ** n_step
+        if target_update and tau:
+            raise ValueError('target_update and tau are two kinds of target network, pass only one')
+        if double and not (target_update or tau):
+            raise ValueError('double needs a target network, pass target_update or tau as well')
         self.lr = lr
         self.gamma = gamma
         self.model = model
         self.optimizer = optim.Adam(model.parameters(), lr=self.lr)
         self.criterion = nn.MSELoss()
+        self.n_updates = 0
+        self.target_update = target_update
+        self.tau = tau
+        self.double = double
+        self.n_step = n_step
 
-    def train_step(self, state, action, reward, next_state, done):
-        state = torch.tensor(state, dtype=torch.float)
-        next_state = torch.tensor(next_state, dtype=torch.float)
-        action = torch.tensor(action, dtype=torch.long)
-        reward = torch.tensor(reward, dtype=torch.float)
-        # (n, x)
+        self.target_model = None
+        if target_update or tau:
+            self.target_model = copy.deepcopy(model)
+            self.target_model.requires_grad_(False)
+
+    def update_target(self):
+        if self.tau:
+            with torch.no_grad():
+                for target, param in zip(self.target_model.parameters(), self.model.parameters()):
+                    target.lerp_(param, self.tau)
+        elif self.n_updates % self.target_update == 0:
+            self.target_model.load_state_dict(self.model.state_dict())
+
+    def train_step(self, state, action, reward, next_state, done, weights=None, gamma=None):
+        # batched tensors: state/next_state (n, x), action int codes (n,), reward (n,), done 0/1 (n,)
+        # weights: optional importance-sampling weights (n,) from prioritized replay
+        # gamma: bootstrap discount, gamma ** n_step by default
+        # returns the loss and the TD error of every sample
+        if gamma is None:
+            gamma = self.gamma ** self.n_step
+        state = torch.as_tensor(state, dtype=torch.float)
+        next_state = torch.as_tensor(next_state, dtype=torch.float)
+        action = torch.as_tensor(action, dtype=torch.long)
+        reward = torch.as_tensor(reward, dtype=torch.float)
+        done = torch.as_tensor(done, dtype=torch.float)
 
         if len(state.shape) == 1:
             # (1, x)
@@ -45,27 +78,35 @@ class QTrainer:
             next_state = torch.unsqueeze(next_state, 0)
             action = torch.unsqueeze(action, 0)
             reward = torch.unsqueeze(reward, 0)
-            done = (done, )
+            done = torch.unsqueeze(done, 0)
 
         # 1: predicted Q values with current state
         pred = self.model(state)
 
-        target = pred.clone()
-        for idx in range(len(done)):
-            Q_new = reward[idx]
-            if not done[idx]:
-                Q_new = reward[idx] + self.gamma * torch.max(self.model(next_state[idx]))
-
-            target[idx][torch.argmax(action[idx]).item()] = Q_new
-    
         # 2: Q_new = r + y * max(next_predicted Q value) -> only do this if not done
-        # pred.clone()
-        # preds[argmax(action)] = Q_new
+        with torch.no_grad():
+            target_model = self.target_model if self.target_model is not None else self.model
+            if self.double:
+                next_action = self.model(next_state).argmax(dim=1, keepdim=True)
+                Q_next = target_model(next_state).gather(1, next_action).squeeze(1)
+            else:
+                Q_next = target_model(next_state).max(dim=1).values
+            Q_new = reward + gamma * Q_next * (1 - done)
+
+        # preds[action] = Q_new, the other outputs keep their prediction
+        target = pred.detach().scatter(1, action.unsqueeze(1), Q_new.unsqueeze(1))
+
         self.optimizer.zero_grad()
-        loss = self.criterion(target, pred)
+        if weights is None:
+            loss = self.criterion(pred, target)
+        else:
+            loss = (weights * ((pred - target) ** 2).mean(dim=1)).mean()
         loss.backward()
 
         self.optimizer.step()
+        self.n_updates += 1
+        if self.target_model is not None:
+            self.update_target()
 
-
-
+        td_errors = (target - pred.detach()).gather(1, action.unsqueeze(1)).squeeze(1)
+        return loss.item(), td_errors.numpy()
@@ -0,0 +1,147 @@
+import argparse
+import json
+import math
+import random
+import time
+import numpy as np
+import torch
+import multiprocessing as mp
+from agent import Agent, train
+
+# name -> (low, high, log scale, integer)
+SEARCH_SPACE = {
+    'lr': (1e-4, 1e-2, True, False),
+    'gamma': (0.8, 0.99, False, False),
+    'batch_size': (64, 4096, True, True),
+    'epsilon_start': (0, 200, False, True),
+}
+PERTURB_FACTORS = (0.8, 1.2)
+
+
+def sample_hyperparams(rng):
+    hypers = {}
+    for name, (low, high, log, integer) in SEARCH_SPACE.items():
+        value = math.exp(rng.uniform(math.log(low), math.log(high))) if log else rng.uniform(low, high)
+        hypers[name] = int(round(value)) if integer else value
+    return hypers
+
+
+def perturb(hypers, rng):
+    new = {}
+    for name, value in hypers.items():
+        low, high, _, integer = SEARCH_SPACE[name]
+        value = min(high, max(low, value * rng.choice(PERTURB_FACTORS)))
+        new[name] = int(round(value)) if integer else value
+    return new
+
+
+def member(seed, conn):
+    # one population member per process, driven by commands from run()
+    torch.set_num_threads(1)
+    random.seed(seed)
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+    agent = None
+    while True:
+        command, payload = conn.recv()
+        if command == 'init':
+            agent = Agent(**payload)
+        elif command == 'train':
+            start = agent.n_games
+            train(agent, max_games=start + payload, quiet=True)
+            conn.send(float(np.mean(agent.scores[start:])))
+        elif command == 'get':
+            conn.send((agent.model.state_dict(), agent.trainer.optimizer.state_dict(), agent.hyperparams))
+        elif command == 'set':
+            model_state, optimizer_state, hypers = payload
+            agent.model.load_state_dict(model_state)
+            agent.trainer.optimizer.load_state_dict(optimizer_state)
+            if agent.trainer.target_model is not None:
+                agent.trainer.target_model.load_state_dict(model_state)
+            agent.set_hyperparams(**hypers)
+        elif command == 'save':
+            agent.model.save(payload)
+        elif command == 'stop':
+            break
+
+
+def run(population=8, interval=20, generations=50, fraction=0.25, lineage_path='pbt_lineage.jsonl', seed=0):
+    """
+    Population-based training: every `interval` games all members are ranked on
+    their mean score over the interval, the bottom `fraction` copy weights and
+    optimizer state from a random member of the top `fraction` and continue with
+    perturbed copies of its hyperparameters.
+    """
+    if generations < 1:
+        raise ValueError('generations must be at least 1')
+    rng = random.Random(seed)
+    ctx = mp.get_context('spawn')
+    conns, procs = [], []
+    for i in range(population):
+        parent, child = ctx.Pipe()
+        proc = ctx.Process(target=member, args=(seed + i, child), daemon=True)
+        proc.start()
+        conns.append(parent)
+        procs.append(proc)
+
+    hypers = [sample_hyperparams(rng) for _ in range(population)]
+    for conn, h in zip(conns, hypers):
+        conn.send(('init', h))
+
+    n_swap = max(1, int(population * fraction))
+    # copy of the best member as it was when it set the best score, later
+    # exploit steps may overwrite that member's weights and hyperparameters
+    best_score, best = -1.0, None
+    with open(lineage_path, 'a') as lineage:
+        for generation in range(1, generations + 1):
+            start = time.time()
+            # all members train in parallel, then report their mean score over the interval
+            for conn in conns:
+                conn.send(('train', interval))
+            scores = [conn.recv() for conn in conns]
+
+            ranked = sorted(range(population), key=lambda i: scores[i])
+            losers, winners = ranked[:n_swap], ranked[-n_swap:]
+            if scores[ranked[-1]] > best_score:
+                best_score = scores[ranked[-1]]
+                conns[ranked[-1]].send(('get', None))
+                best = conns[ranked[-1]].recv()
+
+            for i in range(population):
+                lineage.write(json.dumps({'generation': generation, 'member': i, 'score': scores[i],
+                                          'hyperparams': hypers[i], 'event': 'eval'}) + '\n')
+            for loser in losers:
+                winner = rng.choice(winners)
+                conns[winner].send(('get', None))
+                model_state, optimizer_state, _ = conns[winner].recv()
+                hypers[loser] = perturb(hypers[winner], rng)
+                conns[loser].send(('set', (model_state, optimizer_state, hypers[loser])))
+                lineage.write(json.dumps({'generation': generation, 'member': loser, 'parent': winner,
+                                          'score': scores[loser], 'parent_score': scores[winner],
+                                          'hyperparams': hypers[loser], 'event': 'exploit'}) + '\n')
+            lineage.flush()
+
+            print('Generation', generation, 'best {:.2f}'.format(scores[ranked[-1]]),
+                  'median {:.2f}'.format(float(np.median(scores))),
+                  'hyperparams', hypers[ranked[-1]], '{:.1f}s'.format(time.time() - start))
+
+    # the population is done training, so member 0 can hold the best copy for saving
+    conns[0].send(('set', best))
+    conns[0].send(('save', 'model.pth'))
+    for conn in conns:
+        conn.send(('stop', None))
+    for proc in procs:
+        proc.join()
+    return best_score, best[2]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Population-based training of Snake agents.')
+    parser.add_argument('--population', type=int, default=mp.cpu_count(), help='number of agents, one process each')
+    parser.add_argument('--interval', type=int, default=20, help='games between exploit/explore steps')
+    parser.add_argument('--generations', type=int, default=50)
+    parser.add_argument('--fraction', type=float, default=0.25, help='share of the population replaced each step')
+    parser.add_argument('--lineage', default='pbt_lineage.jsonl', help='append the lineage log to this file')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    run(args.population, args.interval, args.generations, args.fraction, args.lineage, args.seed)
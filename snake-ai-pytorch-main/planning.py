@@ -0,0 +1,202 @@
+import argparse
+import random
+import time
+from collections import namedtuple
+import numpy as np
+from game import SnakeGameAI, Point, BLOCK_SIZE, CLOCK_WISE, TURN, action_code
+
+# Immutable game position for lookahead search. Cells are ints (y * cols + x),
+# body is a tuple with the head first, occupied a bitmask of the body cells,
+# direction an index into CLOCK_WISE and food_seed drives the food placed after
+# the planned snake eats. Stepping builds a new state and never touches the old
+# one, so a snapshot is just a reference and restoring is free.
+SnakeState = namedtuple('SnakeState', 'body, occupied, direction, food, score, frame, food_seed')
+
+# (dx, dy) in cells for each CLOCK_WISE index: right, down, left, up
+STEP = ((1, 0), (0, 1), (-1, 0), (0, -1))
+
+
+class SnakeSim:
+    """
+    Headless Snake rules on SnakeState for a board of cols x rows cells:
+    the same moves, rewards and end conditions as SnakeGameAI.play_step.
+    Food eaten during a rollout is replaced from the state's food_seed, the
+    real game's next food is not known in advance.
+    """
+
+    def __init__(self, cols=32, rows=24):
+        self.cols = cols
+        self.rows = rows
+
+    @classmethod
+    def for_game(cls, game):
+        return cls(game.cols, game.rows)
+
+    def snapshot(self, game, food_seed=None):
+        # SnakeState of a live SnakeGameAI
+        cells = tuple(int(pt.y) // BLOCK_SIZE * self.cols + int(pt.x) // BLOCK_SIZE for pt in game.snake)
+        occupied = 0
+        for cell in cells:
+            occupied |= 1 << cell
+        food = int(game.food.y) // BLOCK_SIZE * self.cols + int(game.food.x) // BLOCK_SIZE
+        if food_seed is None:
+            food_seed = random.getrandbits(64)
+        return SnakeState(cells, occupied, CLOCK_WISE.index(game.direction), food,
+                          game.score, game.frame_iteration, food_seed)
+
+    def restore(self, game, state):
+        # puts a SnakeGameAI into the position of `state`
+        game.set_state([self.point(cell) for cell in state.body], CLOCK_WISE[state.direction],
+                       self.point(state.food), state.score, state.frame)
+
+    def point(self, cell):
+        return Point((cell % self.cols) * BLOCK_SIZE, (cell // self.cols) * BLOCK_SIZE)
+
+    def _neighbour(self, cell, direction):
+        # cell one step away in CLOCK_WISE direction, None off the board
+        dx, dy = STEP[direction]
+        x, y = cell % self.cols + dx, cell // self.cols + dy
+        if 0 <= x < self.cols and 0 <= y < self.rows:
+            return y * self.cols + x
+        return None
+
+    def _place_food(self, occupied, food_seed):
+        rng = random.Random(food_seed)
+        n_cells = self.cols * self.rows
+        if occupied == (1 << n_cells) - 1:
+            return -1, rng.getrandbits(64)
+        while True:
+            cell = rng.randrange(n_cells)
+            if not occupied >> cell & 1:
+                return cell, rng.getrandbits(64)
+
+    def step(self, state, action):
+        """
+        Returns (next state, reward, done) for an action code or one-hot
+        action. Finished games are returned with the head off the board or
+        on the body, as SnakeGameAI leaves them.
+        """
+        body, occupied = state.body, state.occupied
+        direction = (state.direction + TURN[action_code(action)]) % 4
+        frame = state.frame + 1
+        head = self._neighbour(body[0], direction)
+        if head is None or occupied >> head & 1 or frame > 100 * (len(body) + 1):
+            body = (body[0] if head is None else head,) + body
+            return state._replace(body=body, direction=direction, frame=frame), -10, True
+
+        if head == state.food:
+            occupied |= 1 << head
+            food, food_seed = self._place_food(occupied, state.food_seed)
+            return SnakeState((head,) + body, occupied, direction, food, state.score + 1, frame, food_seed), 10, False
+
+        occupied = (occupied | 1 << head) & ~(1 << body[-1])
+        return state._replace(body=(head,) + body[:-1], occupied=occupied, direction=direction, frame=frame), 0, False
+
+    def rollout(self, state, actions, gamma=1.0):
+        # plays a sequence of actions, returns (final state, discounted return, done)
+        ret, discount = 0.0, 1.0
+        for action in actions:
+            state, reward, done = self.step(state, action)
+            ret += discount * reward
+            discount *= gamma
+            if done:
+                return state, ret, True
+        return state, ret, False
+
+    def features(self, state):
+        # the 11 features of game.get_state
+        head = state.body[0]
+        direction = state.direction
+        hx, hy = head % self.cols, head // self.cols
+        fx, fy = state.food % self.cols, state.food // self.cols
+
+        def danger(turn):
+            cell = self._neighbour(head, (direction + turn) % 4)
+            return cell is None or bool(state.occupied >> cell & 1)
+
+        return np.array([
+            danger(0), danger(1), danger(-1),
+            direction == 2, direction == 0, direction == 3, direction == 1,
+            fx < hx, fx > hx, fy < hy, fy > hy,
+        ], dtype=int)
+
+
+class BeamPlanner:
+    """
+    Beam search over the three relative actions. Leaves are valued by their
+    discounted rewards plus gamma ** depth * max Q of the last state, all
+    leaves of one depth in a single batched forward pass. `policy` is anything
+    with a q_values(states) method, e.g. inference.NumpyPolicy.
+    """
+
+    def __init__(self, policy, sim, depth=4, width=32, gamma=0.9):
+        if depth < 1:
+            raise ValueError('depth must be at least 1')
+        self.policy = policy
+        self.sim = sim
+        self.depth = depth
+        self.width = width
+        self.gamma = gamma
+        self.nodes = 0
+
+    def plan(self, state):
+        # beam entries: (value so far, discount, state, first action, done)
+        beam = [(0.0, 1.0, state, None, False)]
+        for _ in range(self.depth):
+            children = []
+            for value, discount, node, first, done in beam:
+                if done:
+                    children.append((value, discount, node, first, True))
+                    continue
+                for action in range(3):
+                    child, reward, child_done = self.sim.step(node, action)
+                    children.append((value + discount * reward, discount * self.gamma, child,
+                                     action if first is None else first, child_done))
+            self.nodes += len(children)
+
+            live = [i for i, c in enumerate(children) if not c[4]]
+            scores = np.array([c[0] for c in children])
+            if live:
+                q = self.policy.q_values(np.stack([self.sim.features(children[i][2]) for i in live]))
+                scores[live] += np.array([children[i][1] for i in live]) * q.max(axis=1)
+            order = np.argsort(-scores, kind='stable')[:self.width]
+            beam = [children[i] for i in order]
+            best = beam[0][3]
+            if all(c[4] for c in beam):
+                break
+        return best
+
+
+def play(planner, games=10, seed=0):
+    # greedy games with the planner choosing every move, returns the scores
+    game = SnakeGameAI()
+    rng = random.Random(seed)
+    scores = []
+    for i in range(games):
+        game.reset(seed + i)
+        done = False
+        while not done:
+            action = planner.plan(planner.sim.snapshot(game, food_seed=rng.getrandbits(64)))
+            _, done, score = game.play_step(action)
+        scores.append(score)
+    return scores
+
+
+if __name__ == '__main__':
+    from evaluate import load_weights
+    from inference import NumpyPolicy
+
+    parser = argparse.ArgumentParser(description='Play Snake with beam search on top of the Q-network.')
+    parser.add_argument('model', nargs='?', default='model/model.pth', help='.pth, .npz or checkpoint directory')
+    parser.add_argument('--games', type=int, default=10)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--width', type=int, default=32)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    planner = BeamPlanner(NumpyPolicy(*load_weights(args.model)), SnakeSim(), args.depth, args.width)
+    start = time.perf_counter()
+    scores = play(planner, args.games, args.seed)
+    elapsed = time.perf_counter() - start
+    print('Scores', scores, 'mean {:.2f}'.format(float(np.mean(scores))))
+    print('{} nodes in {:.1f}s, {:.0f} nodes/sec'.format(planner.nodes, elapsed, planner.nodes / elapsed))
@@ -0,0 +1,71 @@
+import queue
+import threading
+import time
+
+
+class BatchPrefetcher:
+    """
+    Samples minibatches from a replay buffer on a background thread and keeps
+    up to `depth` of them ready in a bounded queue, so the learner only pays
+    for the queue get before each gradient step.
+
+    The buffer is shared with the training loop: writes to it (push,
+    update_priorities) have to hold `lock`. Batches may be up to `depth`
+    updates old, prioritized sampling therefore sees slightly stale priorities.
+    """
+
+    def __init__(self, memory, batch_size, depth=2):
+        self.memory = memory
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.gets = 0
+        self.empty = 0 # gets that found no batch ready
+        self.wait = 0.0 # seconds spent waiting on an empty queue
+        self._queue = queue.Queue(maxsize=depth)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='batch-prefetch', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self.lock:
+                batch = self.memory.sample(self.batch_size) if len(self.memory) else None
+            if batch is None:
+                self._stop.wait(0.01)
+                continue
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(batch, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    def get(self, batch_size=None):
+        # the next ready batch; other batch sizes are sampled directly
+        if batch_size is not None and batch_size != self.batch_size:
+            with self.lock:
+                return self.memory.sample(batch_size)
+        self.gets += 1
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            self.empty += 1
+        start = time.perf_counter()
+        batch = self._queue.get()
+        self.wait += time.perf_counter() - start
+        return batch
+
+    @property
+    def stats(self):
+        return {'gets': self.gets, 'empty': self.empty, 'empty_rate': self.empty / self.gets if self.gets else 0.0,
+                'wait': self.wait}
+
+    def close(self):
+        self._stop.set()
+        # unblock a put waiting on a full queue
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._thread.join()
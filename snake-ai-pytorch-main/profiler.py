@@ -0,0 +1,91 @@
+import time
+from contextlib import nullcontext
+
+_NULL = nullcontext()
+
+
+class _Section:
+    # reusable timer for one phase, no allocation per use
+
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profiler.add(self.name, time.perf_counter() - self.start)
+
+
+class Profiler:
+    """
+    Cumulative and per-episode wall time and call counts per training phase:
+
+        with prof.section('play_step'):
+            game.play_step(move)
+
+    When disabled, section() hands out a shared no-op context manager.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._sections = {}
+        self.total = {} # name -> [seconds, calls]
+        self.episode = {}
+        self.gauges = {}
+        self.episodes = 0
+        self.start = time.perf_counter()
+
+    def section(self, name):
+        if not self.enabled:
+            return _NULL
+        section = self._sections.get(name)
+        if section is None:
+            section = self._sections[name] = _Section(self, name)
+        return section
+
+    def add(self, name, seconds, calls=1):
+        for table in (self.total, self.episode):
+            entry = table.get(name)
+            if entry is None:
+                table[name] = [seconds, calls]
+            else:
+                entry[0] += seconds
+                entry[1] += calls
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self.gauges[name] = value
+
+    def end_episode(self):
+        last, self.episode = self.episode, {}
+        self.episodes += 1
+        return last
+
+    def summary(self, last_episode=None):
+        elapsed = time.perf_counter() - self.start
+        timed = sum(seconds for seconds, _ in self.total.values())
+        lines = ['{:<20} {:>10} {:>10} {:>7} {:>12} {:>12}'.format(
+            'phase', 'calls', 'total s', '%', 'per call us', 'last game s')]
+        for name, (seconds, calls) in sorted(self.total.items(), key=lambda item: -item[1][0]):
+            last = (last_episode or {}).get(name, (0.0, 0))[0]
+            lines.append('{:<20} {:>10} {:>10.3f} {:>7.1f} {:>12.1f} {:>12.4f}'.format(
+                name, calls, seconds, 100 * seconds / timed if timed else 0.0,
+                1e6 * seconds / calls if calls else 0.0, last))
+        lines.append('{:<20} {:>10} {:>10.3f}   ({:.1f}% of wall time timed)'.format(
+            'total', '', timed, 100 * timed / elapsed if elapsed else 0.0))
+        for name, value in sorted(self.gauges.items()):
+            lines.append('{:<20} {}'.format(name, value))
+        return '\n'.join(lines)
+
+    def report(self, last_episode=None, path=None):
+        text = 'after {} games\n{}\n'.format(self.episodes, self.summary(last_episode))
+        if path is None:
+            print(text)
+        else:
+            with open(path, 'a') as f:
+                f.write(text + '\n')
@@ -0,0 +1,133 @@
+import argparse
+import random
+import struct
+import numpy as np
+from game import SnakeGameAI
+from agent import Agent
+
+# one record per episode: seed, number of steps, final score, then the
+# action codes packed four to a byte (2 bits each)
+HEADER = struct.Struct('<QII')
+
+
+def pack_actions(actions):
+    codes = np.zeros(-(-len(actions) // 4) * 4, dtype=np.uint8)
+    codes[:len(actions)] = actions
+    return (codes[0::4] | codes[1::4] << 2 | codes[2::4] << 4 | codes[3::4] << 6).tobytes()
+
+
+def unpack_actions(data, n):
+    packed = np.frombuffer(data, dtype=np.uint8)
+    codes = np.empty(len(packed) * 4, dtype=np.uint8)
+    for i in range(4):
+        codes[i::4] = (packed >> (2 * i)) & 3
+    return codes[:n]
+
+
+class EpisodeRecorder:
+    """
+    Appends seeded episodes to a compact log. Call start() before a game to get
+    its seed, record() with every action code and finish() when it is over.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'ab')
+        self.seed = None
+        self.actions = []
+
+    def start(self):
+        self.seed = random.getrandbits(64)
+        self.actions = []
+        return self.seed
+
+    def record(self, action):
+        self.actions.append(action)
+
+    def finish(self, score):
+        self._file.write(HEADER.pack(self.seed, len(self.actions), score))
+        self._file.write(pack_actions(self.actions))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+def read_episodes(path):
+    # yields (seed, action codes, score) for every episode in the log
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(HEADER.size)
+            if len(header) < HEADER.size:
+                return
+            seed, n, score = HEADER.unpack(header)
+            yield seed, unpack_actions(f.read(-(-n // 4)), n), score
+
+
+def replay(seed, actions, render=False):
+    # rebuilds an episode, headless at full speed unless render is set; returns the final score
+    game = SnakeGameAI(render=render, seed=seed)
+    score = 0
+    for action in actions:
+        _, done, score = game.play_step(int(action))
+        if done:
+            break
+    return score
+
+
+def episode_transitions(seed, actions):
+    # (states, actions, rewards, next_states, dones) arrays of one recorded episode
+    game = SnakeGameAI(seed=seed)
+    n = len(actions)
+    states = np.empty((n + 1, 11), dtype=np.uint8)
+    rewards = np.zeros(n, dtype=np.float32)
+    dones = np.zeros(n, dtype=np.bool_)
+    states[0] = Agent.get_state(game)
+    for i, action in enumerate(actions):
+        rewards[i], dones[i], _ = game.play_step(int(action))
+        states[i + 1] = Agent.get_state(game)
+    return states[:-1], actions, rewards, states[1:], dones
+
+
+def load_into_memory(path, memory):
+    # bulk-fills a replay buffer from a recording, one push_batch per episode
+    episodes = transitions = 0
+    for seed, actions, _ in read_episodes(path):
+        memory.push_batch(*episode_transitions(seed, actions))
+        episodes += 1
+        transitions += len(actions)
+    return episodes, transitions
+
+
+def pretrain(agent, path, updates):
+    # offline pretraining of Linear_QNet on recorded episodes
+    episodes, transitions = load_into_memory(path, agent.memory)
+    loss = None
+    for _ in range(updates):
+        loss = agent.train_long_memory()
+    return episodes, transitions, loss
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay recorded Snake episodes or pretrain on them.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('replay', help='replay episodes and check their scores')
+    p.add_argument('log')
+    p.add_argument('--episode', type=int, default=None, help='only this episode (0-based)')
+    p.add_argument('--render', action='store_true')
+    p = sub.add_parser('pretrain', help='fill the replay memory from a log and train offline')
+    p.add_argument('log')
+    p.add_argument('--updates', type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == 'replay':
+        for i, (seed, actions, score) in enumerate(read_episodes(args.log)):
+            if args.episode is not None and i != args.episode:
+                continue
+            replayed = replay(seed, actions, render=args.render)
+            print('Episode', i, 'Steps', len(actions), 'Score', replayed, '' if replayed == score else '(recorded {})'.format(score))
+    else:
+        agent = Agent()
+        episodes, transitions, loss = pretrain(agent, args.log, args.updates)
+        print('Pretrained on', episodes, 'episodes,', transitions, 'transitions, final loss', loss)
+        agent.model.save()
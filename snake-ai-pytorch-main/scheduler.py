@@ -0,0 +1,26 @@
+class UpdateScheduler:
+    """
+    Step-based update cadence: every `train_every` environment steps run
+    train_every * replay_ratio minibatch updates of `batch_size` samples
+    (fractions carry over), nothing until the memory holds `warmup` transitions.
+    """
+
+    def __init__(self, train_every=4, replay_ratio=0.25, warmup=1000, batch_size=64):
+        if train_every < 1:
+            raise ValueError('train_every must be at least 1')
+        self.train_every = train_every
+        self.replay_ratio = replay_ratio
+        self.warmup = warmup
+        self.batch_size = batch_size
+        self.steps = 0
+        self.credit = 0.0
+
+    def step(self, memory_size):
+        # number of gradient steps to run after this environment step
+        self.steps += 1
+        if memory_size < self.warmup or self.steps % self.train_every:
+            return 0
+        self.credit += self.train_every * self.replay_ratio
+        n = int(self.credit)
+        self.credit -= n
+        return n
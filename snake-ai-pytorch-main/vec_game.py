@@ -0,0 +1,141 @@
+import numpy as np
+from game import BLOCK_SIZE
+
+# clockwise direction order, same as CLOCK_WISE in game.py: right, down, left, up
+DIR_DX = np.array([1, 0, -1, 0])
+DIR_DY = np.array([0, 1, 0, -1])
+TURN = np.array([0, 1, -1]) # [straight, right, left]
+
+
+class VecSnakeGame:
+    """
+    N headless Snake games stepped in lockstep, all state kept in NumPy arrays.
+    Coordinates are grid cells, the rules match SnakeGameAI.play_step and the
+    features match Agent.get_state.
+    """
+
+    def __init__(self, n, w=640, h=480, seed=None):
+        self.n = n
+        self.cols = w // BLOCK_SIZE
+        self.rows = h // BLOCK_SIZE
+        self.max_len = self.cols * self.rows + 1
+        self.rng = np.random.default_rng(seed)
+        self._all = np.arange(n)
+
+        # body[g] is a ring buffer of cells, body[g, start[g]] is the head
+        self.body_x = np.zeros((n, self.max_len), dtype=np.int32)
+        self.body_y = np.zeros((n, self.max_len), dtype=np.int32)
+        self.start = np.zeros(n, dtype=np.int64)
+        self.length = np.zeros(n, dtype=np.int64)
+        # occupancy counts, one extra cell of padding on every side for out of bounds lookups
+        self.grid = np.zeros((n, self.rows + 2, self.cols + 2), dtype=np.uint8)
+
+        self.direction = np.zeros(n, dtype=np.int64)
+        self.food_x = np.zeros(n, dtype=np.int32)
+        self.food_y = np.zeros(n, dtype=np.int32)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.frame_iteration = np.zeros(n, dtype=np.int64)
+        # score of the last finished game for every slot
+        self.final_scores = np.zeros(n, dtype=np.int64)
+
+        self.reset()
+
+    def reset(self, games=None):
+        if games is None:
+            games = self._all
+        if len(games) == 0:
+            return
+        hx, hy = self.cols // 2, self.rows // 2
+        self.grid[games] = 0
+        self.start[games] = 0
+        self.length[games] = 3
+        for i in range(3):
+            self.body_x[games, i] = hx - i
+            self.body_y[games, i] = hy
+            self.grid[games, hy + 1, hx - i + 1] += 1
+        self.direction[games] = 0
+        self.score[games] = 0
+        self.frame_iteration[games] = 0
+        self._place_food(games)
+
+    def _place_food(self, games):
+        # rejection sampling, redrawing only the games whose food landed on the snake
+        while len(games):
+            x = self.rng.integers(0, self.cols, len(games))
+            y = self.rng.integers(0, self.rows, len(games))
+            self.food_x[games] = x
+            self.food_y[games] = y
+            games = games[self.grid[games, y + 1, x + 1] > 0]
+
+    def _heads(self):
+        return self.body_x[self._all, self.start], self.body_y[self._all, self.start]
+
+    def _occupied(self, x, y):
+        # hits boundary or the body
+        outside = (x < 0) | (x >= self.cols) | (y < 0) | (y >= self.rows)
+        x = np.clip(x, -1, self.cols)
+        y = np.clip(y, -1, self.rows)
+        return outside | (self.grid[self._all, y + 1, x + 1] > 0)
+
+    def get_states(self):
+        hx, hy = self._heads()
+        d = self.direction
+        danger = [self._occupied(hx + DIR_DX[k], hy + DIR_DY[k]) for k in (d, (d + 1) % 4, (d - 1) % 4)]
+
+        states = np.empty((self.n, 11), dtype=int)
+        states[:, 0] = danger[0] # straight
+        states[:, 1] = danger[1] # right
+        states[:, 2] = danger[2] # left
+        states[:, 3] = d == 2 # left
+        states[:, 4] = d == 0 # right
+        states[:, 5] = d == 3 # up
+        states[:, 6] = d == 1 # down
+        states[:, 7] = self.food_x < hx
+        states[:, 8] = self.food_x > hx
+        states[:, 9] = self.food_y < hy
+        states[:, 10] = self.food_y > hy
+        return states
+
+    def step(self, actions):
+        """
+        actions: int codes [N] (0 straight, 1 right, 2 left)
+        returns (states[N, 11], rewards[N], dones[N]); finished games are reset,
+        so their state row is the first observation of the next game
+        """
+        g = self._all
+        self.frame_iteration += 1
+        self.direction = (self.direction + TURN[np.asarray(actions)]) % 4
+        hx, hy = self._heads()
+        nx = hx + DIR_DX[self.direction]
+        ny = hy + DIR_DY[self.direction]
+
+        # the tail is still in place when the new head is checked, as in play_step
+        dones = self._occupied(nx, ny) | (self.frame_iteration > 100 * (self.length + 1))
+        alive = g[~dones]
+
+        rewards = np.zeros(self.n, dtype=np.float32)
+        rewards[dones] = -10
+
+        # move the head of live games
+        self.start[alive] = (self.start[alive] - 1) % self.max_len
+        self.length[alive] += 1
+        self.body_x[alive, self.start[alive]] = nx[alive]
+        self.body_y[alive, self.start[alive]] = ny[alive]
+        self.grid[alive, ny[alive] + 1, nx[alive] + 1] += 1
+
+        ate = alive[(nx[alive] == self.food_x[alive]) & (ny[alive] == self.food_y[alive])]
+        self.score[ate] += 1
+        rewards[ate] = 10
+
+        # drop the tail of games that did not eat
+        moved = alive[(nx[alive] != self.food_x[alive]) | (ny[alive] != self.food_y[alive])]
+        tail = (self.start[moved] + self.length[moved] - 1) % self.max_len
+        self.grid[moved, self.body_y[moved, tail] + 1, self.body_x[moved, tail] + 1] -= 1
+        self.length[moved] -= 1
+
+        self._place_food(ate)
+
+        finished = g[dones]
+        self.final_scores[finished] = self.score[finished]
+        self.reset(finished)
+        return self.get_states(), rewards, dones